@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_writer import make_matrix
+from excelcomp.writer import BACKENDS, write_consolidated
+
+# Chart paths compared: matplotlib PNGs (what finalcode.py embeds, one per comparison)
+# against native Excel charts, either one per comparison or one multi-series chart
+MODES = {
+    'image': {'chart_mode': 'image'},
+    'native-separate': {'chart_mode': 'native', 'chart_layout': 'separate'},
+    'native-combined': {'chart_mode': 'native', 'chart_layout': 'combined'},
+}
+
+
+def run_one(mode, merged_df, runs, variance_columns, backend, folder, workers):
+    # Write the data sheet plus its Graphs sheet; the chart cache is off so every image is rendered
+    graph_columns = [c for c in variance_columns if c.startswith(f'{runs[-1]} Vs ')]
+    output_file = os.path.join(folder, f'{mode}.xlsx')
+    start = time.perf_counter()
+    write_consolidated(output_file, merged_df, runs, variance_columns, backend=backend, variance_mode='number',
+                       chart_columns=graph_columns, chart_workers=workers, **MODES[mode])
+    return time.perf_counter() - start, os.path.getsize(output_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write time and file size of image vs native Excel charts")
+    parser.add_argument('--rows', type=int, default=2000, help="transaction rows")
+    parser.add_argument('--reports', type=int, default=5, help="runs (R columns)")
+    parser.add_argument('--backend', default='openpyxl', choices=BACKENDS)
+    parser.add_argument('--workers', type=int, default=1, help="processes rendering the images")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    merged_df, runs, variance_columns = make_matrix(args.rows, args.reports)
+    print(f"{args.rows} rows x {args.reports} reports, {args.backend} backend")
+    print(f"{'mode':>16} {'seconds':>9} {'file MB':>9}")
+    with tempfile.TemporaryDirectory() as folder:
+        for mode in args.modes:
+            seconds, size = run_one(mode, merged_df, runs, variance_columns, args.backend, folder, args.workers)
+            print(f"{mode:>16} {seconds:>9.2f} {size / 2 ** 20:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excelcomp.history import HistoryStore
+from excelcomp.ingest import read_reports
+from excelcomp.model import build_matrix
+from generate_reports import generate_reports, make_report
+
+# History store: cost of appending runs, and of the queries consolidation makes against
+# it, next to parsing the same reports from xlsx.
+#   append   - seconds per run appended
+#   last N   - loading the last N runs as report DataFrames
+#   baseline - the latest run plus the one tagged 'baseline' (the first)
+#   trend    - one transaction's value across every run (the (transaction, run) index)
+#   xlsx     - read_reports of the last N runs written as xlsx, without the parse cache
+# Queries are timed through to the joined matrix, as the pipeline's join stage sees them.
+
+
+def timed(function, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append and query times of the SQLite history store")
+    parser.add_argument('--runs', type=int, default=100, help="runs in the history")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000], help="transactions per run")
+    parser.add_argument('--last', type=int, default=5, help="runs per consolidation (N)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'append s':>9} {'last N ms':>10} {'baseline ms':>12} {'trend ms':>9} {'xlsx ms':>9} {'MB':>7}")
+    for rows in args.rows:
+        rng = np.random.default_rng(0)
+        names = np.array([f'Transaction{j}' for j in range(1, rows + 1)], dtype=object)
+        base = rng.lognormal(0.4, 0.35, rows)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'history.sqlite')
+            with HistoryStore(path) as store:
+                start = time.perf_counter()
+                for run in range(1, args.runs + 1):
+                    df = make_report(rng, names, base, run, missing_rate=0.02)
+                    store.add_report(f'Report{run}.xlsx', df, 'baseline' if run == 1 else None, digest=f'run{run}')
+                append = (time.perf_counter() - start) / args.runs
+
+                last, _ = timed(lambda: build_matrix(store.reports(store.select_runs(args.last))))
+                baseline, _ = timed(lambda: build_matrix(store.reports(store.select_runs(1, 'baseline'))))
+                trend, _ = timed(lambda: store.transaction_history(names[rows // 2]))
+
+            files = generate_reports(os.path.join(folder, 'xlsx'), args.last, rows, missing_rate=0.02)
+            xlsx, _ = timed(lambda: build_matrix(read_reports(files)), repeat=1)
+            size = os.path.getsize(path) / 2 ** 20
+        print(f"{rows:>7} {append:>9.3f} {last * 1000:>10.1f} {baseline * 1000:>12.1f} {trend * 1000:>9.2f} "
+              f"{xlsx * 1000:>9.1f} {size:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excelcomp.ingest import read_reports
+
+
+def write_reports(folder, reports, rows):
+    # Write `reports` files in the Transactions / time(90%) shape used by input_reports
+    rng = np.random.default_rng(0)
+    files = []
+    for i in range(1, reports + 1):
+        df = pd.DataFrame({
+            'Transactions': [f'Transaction{j}' for j in range(1, rows + 1)],
+            'time(90%)': rng.uniform(0.5, 4.0, rows).round(2),
+        })
+        file = os.path.join(folder, f'Report{i}.xlsx')
+        df.to_excel(file, index=False)
+        files.append(file)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time serial vs process-pool report parsing")
+    parser.add_argument('--reports', type=int, default=16, help="number of report files")
+    parser.add_argument('--rows', type=int, default=5000, help="transactions per report")
+    parser.add_argument('--repeat', type=int, default=3, help="best-of repetitions per worker count")
+    args = parser.parse_args()
+
+    # Worker counts to try: powers of two up to the number of cores, plus the core count itself
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, cores} | {2 ** k for k in range(cores.bit_length()) if 2 ** k <= cores})
+
+    with tempfile.TemporaryDirectory() as folder:
+        files = write_reports(folder, args.reports, args.rows)
+        print(f"{args.reports} reports x {args.rows} rows, {cores} cores")
+        print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+
+        baseline = None
+        for workers in worker_counts:
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                read_reports(files, workers=workers)
+                best = min(best, time.perf_counter() - start)
+            baseline = baseline or best
+            print(f"{workers:>8} {best:>10.3f} {baseline / best:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
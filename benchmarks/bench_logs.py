@@ -0,0 +1,79 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excelcomp.logs import LOG_QUANTILE, log_column, log_report
+from excelcomp.metrics import peak_rss_mb
+
+# Raw log ingestion: throughput, peak memory and accuracy of excelcomp.logs.
+# Writes a synthetic JMeter CSV log (timeStamp,elapsed,label,responseCode,threadName,
+# success) of `samples` lines over `transactions` labels, block by block so the
+# generator itself stays small, then reads it back through log_report. With --exact the
+# log is also loaded whole and the sketch's time(90%) compared with the exact value at
+# the same rank (needs the log to fit in memory).
+BLOCK_SAMPLES = 1000000
+
+
+def write_log(file, samples, transactions, failure_rate=0.01, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = np.array([f'Transaction{j}' for j in range(1, transactions + 1)], dtype=object)
+    medians = rng.lognormal(6.5, 0.6, transactions)  # Typical elapsed ms per transaction
+    start = 1700000000000
+    with open(file, 'w', encoding='utf-8', newline='') as f:
+        f.write('timeStamp,elapsed,label,responseCode,threadName,success\n')
+        for first in range(0, samples, BLOCK_SAMPLES):
+            n = min(BLOCK_SAMPLES, samples - first)
+            which = rng.integers(0, transactions, n)
+            elapsed = (medians[which] * rng.lognormal(0, 0.4, n)).astype(np.int64)
+            failed = rng.random(n) < failure_rate
+            pd.DataFrame({
+                'timeStamp': start + first + np.arange(n),
+                'elapsed': elapsed,
+                'label': labels[which],
+                'responseCode': np.where(failed, 500, 200),
+                'threadName': 'Thread Group 1-1',
+                'success': np.where(failed, 'false', 'true'),
+            }).to_csv(f, header=False, index=False)
+
+
+def exact_quantiles(file, quantile=LOG_QUANTILE):
+    # Latency at rank floor(q * (n - 1)) per label, in seconds, from the whole log
+    df = pd.read_csv(file, usecols=['label', 'elapsed'])
+    return df.groupby('label', sort=False)['elapsed'].agg(
+        lambda values: np.sort(values.to_numpy())[int(np.floor(quantile * (len(values) - 1)))] / 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a raw result log into a time(90%) report")
+    parser.add_argument('--samples', type=int, nargs='+', default=[1000000, 10000000], help="log lines")
+    parser.add_argument('--transactions', type=int, default=200, help="distinct labels")
+    parser.add_argument('--exact', action='store_true', help="also compare with exact quantiles (loads the log)")
+    args = parser.parse_args()
+
+    print(f"{'samples':>10} {'log MB':>8} {'seconds':>8} {'MB/s':>7} {'peak MB':>8} {'max rel err':>11}")
+    for samples in args.samples:
+        with tempfile.TemporaryDirectory() as folder:
+            file = os.path.join(folder, 'run.csv')
+            write_log(file, samples, args.transactions)
+            size = os.path.getsize(file) / 2 ** 20
+
+            start = time.perf_counter()
+            report = log_report(file)
+            seconds = time.perf_counter() - start
+            peak = peak_rss_mb()
+
+            error = ''
+            if args.exact:
+                exact = exact_quantiles(file).reindex(report['Transactions']).to_numpy()
+                error = f"{np.nanmax(np.abs(report[log_column()].to_numpy() / exact - 1)):.4f}"
+        print(f"{samples:>10} {size:>8.1f} {seconds:>8.2f} {size / seconds:>7.1f} {peak or 0:>8.1f} {error:>11}")
+
+
+if __name__ == '__main__':
+    main()
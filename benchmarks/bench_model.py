@@ -0,0 +1,92 @@
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excelcomp.model import build_matrix
+from generate_reports import make_report
+
+# Memory and time of joining N reports of M transactions plus the default variance columns:
+#   legacy  - the Series-per-report join (reindex + concat on the name index) and a
+#             pd.concat of the variance columns, as join_reports worked before excelcomp.model
+#   float64 - the interned-ID matrix of excelcomp.model
+#   float32 - the same in float32
+# Memory is what tracemalloc sees allocated by the join (peak) and still held by its
+# result (kept), against the raw latencies, N x M float64 values. The transaction name
+# strings belong to the input reports and are shared, so neither side counts them.
+MODES = ('legacy', 'float64', 'float32')
+
+
+def legacy_join(report_dfs, runs):
+    series = [df.set_index(df.columns[0])[df.columns[1]] for df in report_dfs]
+    series = [s[~s.index.duplicated(keep='first')] for s in series]
+    order = series[0].index
+    seen = pd.Index(pd.concat([s.index.to_series() for s in series[1:]])).unique()
+    order = order.append(seen[~seen.isin(order)])
+    merged_df = pd.concat([s.reindex(order) for s in series], axis=1, ignore_index=True)
+    merged_df.columns = runs
+    merged_df.index.name = 'Transactions'
+    merged_df = merged_df.reset_index()
+
+    variances = {}
+    for i in range(len(runs) - 1, 0, -1):
+        new, old = merged_df[runs[-1]], merged_df[runs[i - 1]]
+        variances[f'{runs[-1]} Vs {runs[i - 1]}'] = (new - old) / new * 100
+    return pd.concat([merged_df, pd.DataFrame(variances)], axis=1)
+
+
+def model_join(report_dfs, runs, dtype):
+    matrix = build_matrix(report_dfs, runs, dtype=dtype)
+    names, variances = matrix.variance(plan='baseline')
+    return matrix.to_frame(names, variances)
+
+
+def measure(mode, report_dfs, runs):
+    # (seconds, peak MB, kept MB) of one join
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    if mode == 'legacy':
+        result = legacy_join(report_dfs, runs)
+    else:
+        result = model_join(report_dfs, runs, mode)
+    seconds = time.perf_counter() - start
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, peak / 2 ** 20, kept / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of the legacy join vs the compact matrix model")
+    parser.add_argument('--reports', type=int, nargs='+', default=[5, 50], help="report counts (N)")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help="transactions per report (M)")
+    parser.add_argument('--missing-rate', type=float, default=0.02)
+    parser.add_argument('--duplicate-rate', type=float, default=0.01)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    print(f"{'N':>4} {'M':>8} {'mode':>8} {'seconds':>8} {'raw MB':>7} {'peak MB':>8} {'kept MB':>8} {'kept/raw':>8}")
+    for reports in args.reports:
+        for rows in args.rows:
+            rng = np.random.default_rng(0)
+            names = np.array([f'Transaction{j}' for j in range(1, rows + 1)], dtype=object)
+            base = rng.lognormal(0.4, 0.35, rows)
+            report_dfs = [make_report(rng, names, base, run, args.missing_rate, args.duplicate_rate)
+                          for run in range(1, reports + 1)]
+            runs = [f'R{i}' for i in range(1, reports + 1)]
+            raw = rows * reports * 8 / 2 ** 20
+            for mode in args.modes:
+                seconds, peak, kept = measure(mode, report_dfs, runs)
+                print(f"{reports:>4} {rows:>8} {mode:>8} {seconds:>8.3f} {raw:>7.1f} {peak:>8.1f} {kept:>8.1f} "
+                      f"{kept / raw:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
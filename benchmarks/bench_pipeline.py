@@ -0,0 +1,129 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excelcomp.pipeline import ARTIFACTS, run_pipeline
+from excelcomp.writer import BACKENDS
+from generate_reports import generate_reports
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# End-to-end pipeline benchmark over a grid of N reports x M transactions.
+# Each grid cell gets freshly generated reports and runs the pipeline in its own process
+# (parse cache off), so the peak RSS of one cell does not leak into the next. Per stage
+# it keeps the pipeline's own metrics (see excelcomp.metrics): wall time, CPU time, the
+# process's peak RSS after the stage and how much the stage raised it. Styling runs
+# lazily inside the write stage and is counted there.
+# Every cell is appended as one JSON line to the results file and compared with the
+# previous result for the same settings.
+DEFAULT_RESULTS = os.path.join(ROOT, 'benchmarks', 'results', 'pipeline.ndjson')
+
+
+def run_cell(input_folder, artifacts, backend):
+    # Run the pipeline and return the metrics of its top-level stages
+    excel_files = sorted(os.path.join(input_folder, name) for name in os.listdir(input_folder) if name.endswith('.xlsx'))
+    with tempfile.TemporaryDirectory() as out:
+        outputs = {'report': 'report.xlsx', 'filter': 'filter.csv', 'graphs': 'graphs', 'matrix': 'matrix.arrow'}
+        outputs = {artifact: os.path.join(out, outputs[artifact]) for artifact in artifacts}
+        state = run_pipeline(excel_files, outputs, cache_folder=None, chart_cache_folder=None, backend=backend)
+    return {record['stage']: {key: record[key] for key in ('seconds', 'cpu_seconds', 'peak_rss_mb', 'rss_growth_mb')}
+            for record in state['metrics'].records if record['parent'] is None}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_results(results_file):
+    # Latest earlier record per settings key
+    latest = {}
+    if os.path.exists(results_file):
+        with open(results_file, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    latest[settings_key(record)] = record
+    return latest
+
+
+def settings_key(record):
+    return (record['reports'], record['rows'], record['missing_rate'], record['duplicate_rate'],
+            tuple(record['artifacts']), record['backend'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage wall time and peak memory of the pipeline over N x M")
+    parser.add_argument('--reports', type=int, nargs='+', default=[5, 20], help="report counts (N)")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000], help="transactions per report (M)")
+    parser.add_argument('--missing-rate', type=float, default=0.02)
+    parser.add_argument('--duplicate-rate', type=float, default=0.01)
+    parser.add_argument('--artifacts', nargs='+', default=['report', 'filter', 'matrix'], choices=list(ARTIFACTS))
+    parser.add_argument('--backend', default='openpyxl', choices=BACKENDS)
+    parser.add_argument('--results', default=DEFAULT_RESULTS, help="NDJSON file the results are appended to")
+    parser.add_argument('--run', metavar='FOLDER', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_cell(args.run, args.artifacts, args.backend)))
+        return
+
+    previous = previous_results(args.results)
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    commit = git_commit()
+
+    print(f"{'N':>4} {'M':>8} {'stage':>9} {'seconds':>9} {'cpu s':>8} {'peak MB':>9} {'+MB':>7}")
+    for reports in args.reports:
+        for rows in args.rows:
+            with tempfile.TemporaryDirectory() as folder:
+                generate_reports(folder, reports, rows, args.missing_rate, args.duplicate_rate)
+                result = subprocess.run(
+                    [sys.executable, __file__, '--run', folder, '--artifacts', *args.artifacts, '--backend', args.backend],
+                    capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"{reports:>4} {rows:>8} failed: {result.stderr.strip().splitlines()[-1]}")
+                continue
+
+            stages = json.loads(result.stdout)
+            for stage, metrics in stages.items():
+                print(f"{reports:>4} {rows:>8} {stage:>9} {metrics['seconds']:>9.3f} {metrics['cpu_seconds']:>8.3f} "
+                      f"{metrics['peak_rss_mb']:>9.1f} {metrics['rss_growth_mb']:>7.1f}")
+
+            record = {
+                'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'commit': commit,
+                'python': platform.python_version(),
+                'cpus': os.cpu_count(),
+                'reports': reports,
+                'rows': rows,
+                'missing_rate': args.missing_rate,
+                'duplicate_rate': args.duplicate_rate,
+                'artifacts': args.artifacts,
+                'backend': args.backend,
+                'stages': stages,
+                'seconds': round(sum(metrics['seconds'] for metrics in stages.values()), 4),
+                'peak_rss_mb': max(metrics['peak_rss_mb'] for metrics in stages.values()),
+            }
+            before = previous.get(settings_key(record))
+            total = f"{reports:>4} {rows:>8} {'total':>9} {record['seconds']:>9.3f}"
+            if before:
+                change = (record['seconds'] / before['seconds'] - 1) * 100 if before['seconds'] else 0.0
+                total += f"   ({change:+.1f}% vs {before['commit'] or before['timestamp']})"
+            print(total)
+            with open(args.results, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+
+    print(f"Results appended to {args.results}")
+
+
+if __name__ == '__main__':
+    main()
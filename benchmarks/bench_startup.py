@@ -0,0 +1,91 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Startup guard for the CLI.
+# Each scenario runs `python -X importtime -m excelcomp ...` in a fresh process and fails
+# if it imports a module it has no use for: matplotlib is only needed to render chart
+# images, xlsxwriter only for its backend, and the process pool only with workers > 1.
+# The time spent importing excelcomp's own modules (excluding what they import) is
+# checked against a budget as well. Each scenario is run once first, so the bytecode
+# cache is warm, and then --repeat times; the fastest run counts, which keeps one noisy
+# run on a busy machine from failing the check. The processes keep their bytecode under
+# the temporary folder (PYTHONPYCACHEPREFIX), even where PYTHONDONTWRITEBYTECODE is set. The warm import time is well under
+# 10 ms, so the 25 ms budget leaves room for slower machines while still catching a
+# heavy module imported at startup.
+SCENARIOS = {
+    'help': (['--help'], ('matplotlib', 'xlsxwriter', 'concurrent.futures.process')),
+    'report': (['--report', '{out}/report.xlsx'], ('matplotlib', 'xlsxwriter', 'concurrent.futures.process')),
+    'filter': (['--filter-csv', '{out}/filter.csv'], ('matplotlib', 'xlsxwriter', 'concurrent.futures.process')),
+    'native-charts': (['--report', '{out}/report.xlsx', '--charts', 'native', '--variance-mode', 'number'],
+                      ('matplotlib', 'xlsxwriter')),
+    'graphs': (['--graphs', '{out}/graphs'], ('xlsxwriter',)),
+}
+
+
+def import_times(stderr):
+    # module -> (self us, cumulative us) from -X importtime output
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def run_scenario(arguments, input_folder, out):
+    command = [sys.executable, '-X', 'importtime', '-m', 'excelcomp', input_folder, '--no-cache']
+    command += [argument.format(out=out) for argument in arguments]
+    env = dict(os.environ, PYTHONPYCACHEPREFIX=os.path.join(out, 'pycache'))
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, env=env)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return seconds, import_times(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup time and unneeded-import guard")
+    parser.add_argument('--input-folder', default=os.path.join(ROOT, 'input_reports'))
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--budget-ms', type=float, default=25.0, help="limit for excelcomp's own import time")
+    parser.add_argument('--repeat', type=int, default=3, help="measured runs per scenario (the fastest counts)")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'scenario':>14} {'seconds':>9} {'import s':>9} {'excelcomp ms':>13} {'modules':>8}")
+    with tempfile.TemporaryDirectory() as out:
+        for name in args.scenarios:
+            arguments, forbidden = SCENARIOS[name]
+            run_scenario(arguments, args.input_folder, out)  # Warm-up: compiles the bytecode
+            runs = []
+            for _ in range(max(args.repeat, 1)):
+                seconds, times = run_scenario(arguments, args.input_folder, out)
+                own = sum(self_us for module, (self_us, _) in times.items()
+                          if module.split('.')[0] == 'excelcomp') / 1e3
+                runs.append((own, seconds, times))
+            own, seconds, times = min(runs, key=lambda run: run[0])
+            total = sum(self_us for self_us, _ in times.values()) / 1e6
+            print(f"{name:>14} {seconds:>9.2f} {total:>9.2f} {own:>13.1f} {len(times):>8}")
+
+            unneeded = [module for module in forbidden if module in times]
+            if unneeded:
+                failures.append(f"{name}: imported {', '.join(unneeded)}")
+            if own > args.budget_ms:
+                failures.append(f"{name}: excelcomp imports took {own:.1f} ms (budget {args.budget_ms:g} ms)")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
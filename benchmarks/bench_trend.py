@@ -0,0 +1,79 @@
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excelcomp.model import build_matrix
+from excelcomp.trend import TrendMatrix, trend_files
+from generate_reports import make_report
+
+# Long-history trend queries: the memory-mapped TrendMatrix against joining report DataFrames.
+# A history of `runs` runs of `rows` transactions is appended once; then the last N runs
+# are consolidated with the default variance plan, by
+#   frames - build_matrix over the N report DataFrames (already parsed and in memory)
+#   mapped - a fresh TrendMatrix opened on the files and sliced (pages come from the OS
+#            page cache and are not heap allocations, so tracemalloc does not count them)
+# plus one transaction's trend over every run, read from the mapping.
+# Memory is the peak tracemalloc sees during the query.
+
+
+def measure(function):
+    # (seconds, peak MB) of one call
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return seconds, peak / 2 ** 20
+
+
+def consolidate(matrix):
+    names, variances = matrix.variance()
+    return matrix.to_frame(names, variances)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trend queries on the memory-mapped matrix vs joined reports")
+    parser.add_argument('--runs', type=int, default=500, help="runs in the history")
+    parser.add_argument('--rows', type=int, default=10000, help="transactions per run")
+    parser.add_argument('--last', type=int, nargs='+', default=[10, 100, 500], help="runs per query (N)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    names = np.array([f'Transaction{j}' for j in range(1, args.rows + 1)], dtype=object)
+    base = rng.lognormal(0.4, 0.35, args.rows)
+    report_dfs = [make_report(rng, names, base, run, missing_rate=0.02) for run in range(1, args.runs + 1)]
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'trend')
+        matrix = TrendMatrix(path)
+        start = time.perf_counter()
+        for df in report_dfs:
+            matrix.append(df)
+        append = (time.perf_counter() - start) / args.runs
+        size = sum(os.path.getsize(file) for file in trend_files(path)) / 2 ** 20
+        print(f"appended {args.runs} runs x {args.rows} transactions: {append * 1000:.1f} ms per run, {size:.1f} MB")
+
+        print(f"{'N':>5} {'frames s':>9} {'frames MB':>10} {'mapped s':>9} {'mapped MB':>10}")
+        for last in args.last:
+            runs = [f'R{i}' for i in range(1, min(last, args.runs) + 1)]
+            frames = measure(lambda: consolidate(build_matrix(report_dfs[-last:], runs)))
+            mapped = measure(lambda: consolidate(TrendMatrix(path).matrix(slice(-last, None), labels=runs)))
+            print(f"{last:>5} {frames[0]:>9.3f} {frames[1]:>10.1f} {mapped[0]:>9.3f} {mapped[1]:>10.1f}")
+
+        trend = TrendMatrix(path)
+        seconds, _ = measure(lambda: np.nanmean(trend.trend(names[len(names) // 2])))
+        print(f"one transaction over {args.runs} runs: {seconds * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
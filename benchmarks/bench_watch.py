@@ -0,0 +1,69 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excelcomp.pipeline import run_pipeline
+from excelcomp.variance import DEFAULT_PLAN, PLANS
+from excelcomp.watch import watch_folder
+from generate_reports import generate_reports
+
+# Watch mode latency: time from a new report landing in the folder to the rebuilt
+# consolidated workbook, against a cold run over the same reports (parsing all of them).
+# The new report is written under a temporary name and renamed into place, as a copy
+# tool finishing would; the latency includes the debounce wait. Only the new report is
+# parsed, so for large reports most of what is left is rewriting the workbook, which
+# the xlsxwriter backend does several times faster. A report alone is kept up to date
+# through the saved run matrix (see excelcomp.incremental), with any --comparison.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report-to-workbook latency of the watch loop vs a cold run")
+    parser.add_argument('--reports', type=int, default=10, help="reports already in the folder")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 20000], help="transactions per report")
+    parser.add_argument('--debounce', type=float, default=0.5, help="watch debounce seconds")
+    parser.add_argument('--mode', default='auto', help="watch mode")
+    parser.add_argument('--backend', default='openpyxl', help="workbook writer backend")
+    parser.add_argument('--comparison', nargs='+', choices=PLANS, default=list(DEFAULT_PLAN), help="variance plan")
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'cold s':>7} {'watch s':>8} {'debounce s':>11}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as folder:
+            files = generate_reports(os.path.join(folder, 'generated'), args.reports + 1, rows, missing_rate=0.02)
+            watched = os.path.join(folder, 'input')
+            os.makedirs(watched)
+            for file in files[:-1]:
+                shutil.copy2(file, watched)
+            output = os.path.join(folder, 'report.xlsx')
+
+            start = time.perf_counter()
+            run_pipeline(files, {'report': output}, cache_folder=None, backend=args.backend,
+                         comparison=tuple(args.comparison))
+            cold = time.perf_counter() - start
+
+            builds = []
+            thread = threading.Thread(target=watch_folder, args=(watched, {'report': output}),
+                                      kwargs={'mode': args.mode, 'debounce': args.debounce, 'builds': 2,
+                                              'cache_folder': None, 'backend': args.backend,
+                                              'comparison': tuple(args.comparison),
+                                              'log': lambda message: builds.append(time.perf_counter())})
+            thread.start()
+            while len(builds) < 2:  # The start message, then the first build
+                time.sleep(0.01)
+
+            new = os.path.join(watched, os.path.basename(files[-1]))
+            start = time.perf_counter()
+            shutil.copy(files[-1], new + '.part')
+            os.replace(new + '.part', new)
+            thread.join()
+            latency = builds[-1] - start
+        print(f"{rows:>7} {cold:>7.2f} {latency:>8.2f} {args.debounce:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
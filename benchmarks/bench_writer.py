@@ -0,0 +1,113 @@
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from excelcomp.variance import add_variance_columns
+from excelcomp.writer import BACKENDS, write_consolidated
+
+MODES = ('legacy',) + BACKENDS
+
+
+def make_matrix(rows, reports):
+    # Synthetic consolidated matrix: Transactions, R1..Rn and the default variance columns
+    rng = np.random.default_rng(0)
+    runs = [f'R{i}' for i in range(1, reports + 1)]
+    merged_df = pd.DataFrame(rng.uniform(0.5, 4.0, (rows, reports)).round(2), columns=runs)
+    merged_df.insert(0, 'Transactions', [f'Transaction{j}' for j in range(1, rows + 1)])
+    merged_df, variance_columns = add_variance_columns(merged_df, runs)
+    return merged_df, runs, variance_columns
+
+
+def write_legacy(output_file, merged_df, runs, variance_columns):
+    # What final.py did before the streaming writer: to_excel, reload, restyle every cell, save again
+    from openpyxl import load_workbook
+    from openpyxl.styles import Border, Font, PatternFill, Side
+
+    merged_df.to_excel(output_file, index=False)
+    wb = load_workbook(output_file)
+    ws = wb.active
+    fonts = {key: Font(color=color, bold=True) for key, color in
+             [('red', "FF0000"), ('orange', "FFA500"), ('green', "00b300"), ('black', "000000")]}
+    fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid")
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+
+    for cell in ws[1]:
+        cell.fill = fill
+        cell.border = border
+    for col in runs:
+        col_index = merged_df.columns.get_loc(col) + 1
+        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=col_index, max_col=col_index):
+            for cell in row:
+                if isinstance(cell.value, (int, float)):
+                    cell.font = fonts['red'] if cell.value >= 2 else fonts['orange'] if cell.value >= 1.8 else fonts['green']
+                cell.border = border
+    for variance_column in variance_columns:
+        col_index = merged_df.columns.get_loc(variance_column) + 1
+        for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=col_index, max_col=col_index):
+            for cell in row:
+                if isinstance(cell.value, (int, float)):
+                    arrow = "% ↑" if cell.value > 0 else "% ↓" if cell.value < 0 else "% →"
+                    cell.font = fonts['red'] if cell.value > 0 else fonts['green'] if cell.value < 0 else fonts['black']
+                    cell.value = f"{cell.value:.2f} {arrow}"
+                cell.border = border
+    for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
+        for cell in row:
+            if cell.value is not None:
+                cell.border = border
+    wb.save(output_file)
+
+
+def run_one(mode, rows, reports):
+    # Runs in a fresh process so ru_maxrss is the peak of this mode alone
+    merged_df, runs, variance_columns = make_matrix(rows, reports)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as folder:
+        output_file = os.path.join(folder, 'consolidated_report.xlsx')
+        start = time.perf_counter()
+        if mode == 'legacy':
+            write_legacy(output_file, merged_df, runs, variance_columns)
+        else:
+            write_consolidated(output_file, merged_df, runs, variance_columns, backend=mode)
+        seconds = time.perf_counter() - start
+        size = os.path.getsize(output_file)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux
+    print(f"{seconds:.3f} {before / 1024:.1f} {peak / 1024:.1f} {size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wall time and peak RSS of the consolidated sheet writers")
+    parser.add_argument('--rows', type=int, default=100000, help="transaction rows")
+    parser.add_argument('--reports', type=int, default=5, help="runs (R columns)")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--run', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(args.run, args.rows, args.reports)
+        return
+
+    print(f"{args.rows} rows x {args.reports} reports")
+    print(f"{'mode':>11} {'seconds':>9} {'base MB':>9} {'peak MB':>9} {'file MB':>9}")
+    for mode in args.modes:
+        result = subprocess.run(
+            [sys.executable, __file__, '--run', mode, '--rows', str(args.rows), '--reports', str(args.reports)],
+            capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{mode:>11} failed: {result.stderr.strip().splitlines()[-1]}")
+            continue
+        seconds, base, peak, size = result.stdout.split()
+        print(f"{mode:>11} {float(seconds):>9.2f} {float(base):>9.1f} {float(peak):>9.1f} {int(size) / 2 ** 20:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+# Synthetic reports in the input_reports shape: two columns, Transactions and time(90%).
+# Every report draws from the same pool of `rows` transaction names, then
+#   missing_rate   - drops that share of the transactions from each report (independently),
+#                    so the join sees rows absent from Report 1 and gaps in later runs
+#   duplicate_rate - repeats that share of the remaining rows with a second timing,
+#                    right after the first one
+# Latencies drift a little from run to run so the variance columns are not all zero.
+
+
+def make_report(rng, names, base, run, missing_rate=0.0, duplicate_rate=0.0):
+    # One report as a DataFrame; base holds each transaction's typical latency
+    drift = rng.normal(1.0 + 0.02 * run, 0.15, len(names)).clip(0.3)
+    times = (base * drift).round(2)
+    keep = rng.random(len(names)) >= missing_rate
+    df = pd.DataFrame({'Transactions': names[keep], 'time(90%)': times[keep]})
+
+    if duplicate_rate > 0 and len(df):
+        repeat = rng.random(len(df)) < duplicate_rate
+        second = (df['time(90%)'][repeat] * rng.uniform(0.8, 1.2, repeat.sum())).round(2)
+        duplicates = df[repeat].assign(**{'time(90%)': second})
+        # Interleave each duplicate right after its original row
+        df = pd.concat([df, duplicates]).sort_index(kind='stable').reset_index(drop=True)
+    return df
+
+
+def generate_reports(folder, reports, rows, missing_rate=0.0, duplicate_rate=0.0, seed=0):
+    # Write Report1.xlsx .. ReportN.xlsx into folder and return their paths in order
+    rng = np.random.default_rng(seed)
+    names = np.array([f'Transaction{j}' for j in range(1, rows + 1)], dtype=object)
+    base = rng.lognormal(0.4, 0.35, rows)
+    # xlsxwriter writes large sheets several times faster than openpyxl
+    engine = 'xlsxwriter' if importlib.util.find_spec('xlsxwriter') else 'openpyxl'
+
+    os.makedirs(folder, exist_ok=True)
+    width = len(str(reports))
+    files = []
+    for run in range(1, reports + 1):
+        df = make_report(rng, names, base, run, missing_rate, duplicate_rate)
+        # Zero-padded numbers keep the sorted file order equal to the run order
+        file = os.path.join(folder, f'Report{run:0{width}d}.xlsx')
+        df.to_excel(file, index=False, engine=engine)
+        files.append(file)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic Transactions / time(90%) reports")
+    parser.add_argument('folder', help="output folder")
+    parser.add_argument('--reports', type=int, default=5, help="number of report files (N)")
+    parser.add_argument('--rows', type=int, default=1000, help="transactions per report (M)")
+    parser.add_argument('--missing-rate', type=float, default=0.0, help="share of transactions left out of each report")
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help="share of rows listed twice in a report")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    files = generate_reports(args.folder, args.reports, args.rows, args.missing_rate, args.duplicate_rate, args.seed)
+    print(f"Wrote {len(files)} reports to {args.folder}")
+
+
+if __name__ == '__main__':
+    main()
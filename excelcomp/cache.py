@@ -0,0 +1,196 @@
+import hashlib
+import importlib.util
+import json
+import os
+import time
+import warnings
+
+import pandas as pd
+
+# Defaults for the on-disk parse cache
+DEFAULT_CACHE_FOLDER = ".report_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # Evict least recently used entries above 512 MB
+DEFAULT_MAX_AGE = 30 * 24 * 3600       # Evict entries not used for 30 days
+
+
+def file_digest(file, chunk_size=1024 * 1024):
+    # SHA-256 of the file contents, read in chunks
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ReportCache:
+    # On-disk cache of parsed reports stored as Parquet files.
+    # Entries are content addressed: each one is named after the SHA-256 of the
+    # source xlsx, so an edited file gets a new entry and a renamed or copied file
+    # reuses the old one. index.json remembers the (path, size, mtime) each digest
+    # was computed for, which lets warm runs skip hashing unchanged files as well.
+    # Needs pyarrow; without it every lookup misses and nothing is written.
+
+    def __init__(self, folder=DEFAULT_CACHE_FOLDER, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.enabled = importlib.util.find_spec("pyarrow") is not None
+        self.hits = 0
+        self.misses = 0
+        self._index_file = os.path.join(folder, "index.json")
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_file, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("files", {})
+        index.setdefault("entries", {})
+        return index
+
+    def _entry_path(self, digest):
+        return os.path.join(self.folder, f"{digest}.parquet")
+
+    def digest(self, file):
+        # SHA-256 of file, reusing the stored digest while the file's size and mtime are unchanged
+        stat = os.stat(file)
+        key = os.path.abspath(file)
+        known = self._index["files"].get(key)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["digest"]
+
+        digest = file_digest(file)
+        self._index["files"][key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest}
+        return digest
+
+    def load(self, file):
+        # Return the cached DataFrame for file, or None on a miss
+        if not self.enabled:
+            self.misses += 1
+            return None
+
+        digest = self.digest(file)
+        entry = self._index["entries"].get(digest)
+        if entry is not None:
+            try:
+                df = pd.read_parquet(self._entry_path(digest))
+            except (OSError, ValueError):
+                df = None
+            if df is not None:
+                entry["last_used"] = time.time()
+                self.hits += 1
+                return df
+            # The entry file is gone or unreadable, forget about it
+            del self._index["entries"][digest]
+
+        self.misses += 1
+        return None
+
+    def store(self, file, df):
+        # Save a freshly parsed report; frames Parquet cannot represent are skipped
+        if not self.enabled:
+            return
+
+        digest = self.digest(file)
+        path = self._entry_path(digest)
+        os.makedirs(self.folder, exist_ok=True)
+        try:
+            df.to_parquet(path + ".tmp")
+        except (ValueError, TypeError, ImportError) as exc:
+            # Mixed-type columns (numbers and text in one column) cannot be typed for Parquet
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+            warnings.warn(f"Not caching {file}: {exc}", stacklevel=2)
+            return
+        os.replace(path + ".tmp", path)
+        self._index["entries"][digest] = {"bytes": os.path.getsize(path), "last_used": time.time()}
+
+    def evict(self):
+        # Drop entries older than max_age, then least recently used ones until under max_bytes
+        entries = self._index["entries"]
+        now = time.time()
+        expired = [d for d, e in entries.items() if self.max_age is not None and now - e["last_used"] > self.max_age]
+
+        total = sum(e["bytes"] for d, e in entries.items() if d not in expired)
+        if self.max_bytes is not None:
+            for digest, entry in sorted(entries.items(), key=lambda item: item[1]["last_used"]):
+                if total <= self.max_bytes:
+                    break
+                if digest not in expired:
+                    expired.append(digest)
+                    total -= entry["bytes"]
+
+        for digest in expired:
+            del entries[digest]
+            if os.path.exists(self._entry_path(digest)):
+                os.remove(self._entry_path(digest))
+
+        # Forget files whose source no longer exists or whose entry was evicted
+        self._index["files"] = {
+            path: known for path, known in self._index["files"].items()
+            if known["digest"] in entries and os.path.exists(path)
+        }
+
+    def save(self):
+        # Evict, then write the index atomically so an interrupted run cannot corrupt it
+        if not self.enabled:
+            return
+        self.evict()
+        os.makedirs(self.folder, exist_ok=True)
+        with open(self._index_file + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self._index, f)
+        os.replace(self._index_file + ".tmp", self._index_file)
+
+
+class MemoryReportCache:
+    # Parsed reports kept in memory by a long-running process (see excelcomp.watch), in
+    # front of an optional on-disk ReportCache. Entries are keyed by path, size and mtime,
+    # so a rewritten file is parsed again; retain() drops the files that are gone.
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._digests = {}
+
+    def _key(self, file):
+        stat = os.stat(file)
+        return os.path.abspath(file), stat.st_size, stat.st_mtime_ns
+
+    def load(self, file):
+        key = self._key(file)
+        df = self._entries.get(key)
+        if df is None and self.cache is not None:
+            df = self.cache.load(file)
+            if df is not None:
+                self._entries[key] = df
+        if df is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return df
+
+    def digest(self, file):
+        # SHA-256 of file, computed once per version of it (by the on-disk cache if there is one)
+        key = self._key(file)
+        if key not in self._digests:
+            self._digests[key] = self.cache.digest(file) if self.cache is not None else file_digest(file)
+        return self._digests[key]
+
+    def store(self, file, df):
+        self._entries[self._key(file)] = df
+        if self.cache is not None:
+            self.cache.store(file, df)
+
+    def retain(self, files):
+        # Keep only the current version of each of files
+        current = {self._key(file) for file in files if os.path.exists(file)}
+        self._entries = {key: df for key, df in self._entries.items() if key in current}
+        self._digests = {key: digest for key, digest in self._digests.items() if key in current}
+
+    def save(self):
+        if self.cache is not None:
+            self.cache.save()
@@ -0,0 +1,196 @@
+import hashlib
+import io
+import json
+import os
+import time
+
+import numpy as np
+
+from .cache import DEFAULT_MAX_AGE
+
+# Rendered chart PNGs are cached here, named after a hash of their data and styling
+DEFAULT_CHART_CACHE = ".chart_cache"
+
+# Look of the variance line charts (same as the matplotlib graphs in finalcode.py and mat.py)
+LINE_CHART_STYLE = {
+    'figsize': [8, 6],
+    'marker': 'o',
+    'linestyle': '-',
+    'color': 'b',
+    'xlabel': 'Transactions',
+    'ylabel': 'Variance (%)',
+    'grid': True,
+}
+
+
+def line_chart_spec(title, values, **style):
+    # Everything needed to render one chart; plain data so it can be sent to a worker process
+    return {
+        'kind': 'line',
+        'title': title,
+        'values': np.asarray(values, dtype=float),
+        'style': {**LINE_CHART_STYLE, **style},
+    }
+
+
+def chart_key(spec):
+    # Hash of the series data and the styling; equal keys render identical PNGs
+    digest = hashlib.sha256()
+    digest.update(json.dumps({key: spec[key] for key in ('kind', 'title', 'style')}, sort_keys=True).encode())
+    digest.update(spec['values'].tobytes())
+    return digest.hexdigest()
+
+
+def render_line_chart(spec):
+    # Render one chart to PNG bytes on the Agg canvas.
+    # A bare Figure is not registered with pyplot, so nothing keeps it alive after
+    # this call; it is still cleared explicitly to free its artists right away.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    style = spec['style']
+    values = spec['values']
+    fig = Figure(figsize=style['figsize'])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    # Show T1, T2, T3... on the x-axis instead of the actual transaction names
+    x_labels = [f'T{i + 1}' for i in range(len(values))]
+    ax.plot(x_labels, values, marker=style['marker'], linestyle=style['linestyle'], color=style['color'])
+    ax.set_title(spec['title'])
+    ax.set_xlabel(style['xlabel'])
+    ax.set_ylabel(style['ylabel'])
+    ax.grid(style['grid'])
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    fig.clear()
+    return buf.getvalue()
+
+
+def prune_chart_cache(cache_folder, max_age=DEFAULT_MAX_AGE):
+    # Remove cached charts that have not been used for max_age seconds
+    now = time.time()
+    for name in os.listdir(cache_folder):
+        path = os.path.join(cache_folder, name)
+        if name.endswith('.png') and now - os.path.getmtime(path) > max_age:
+            os.remove(path)
+
+
+def render_charts(specs, workers=1, cache_folder=DEFAULT_CHART_CACHE, render=render_line_chart):
+    # Render every spec to PNG bytes, in spec order.
+    # Charts found in cache_folder are reused; the rest are rendered serially or in a
+    # process pool of `workers` processes and then stored. As with read_reports, the
+    # pool needs an import-safe caller wherever it does not fork.
+    keys = [chart_key(spec) for spec in specs]
+    images = [None] * len(specs)
+
+    if cache_folder:
+        os.makedirs(cache_folder, exist_ok=True)
+        for i, key in enumerate(keys):
+            path = os.path.join(cache_folder, f"{key}.png")
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    images[i] = f.read()
+                os.utime(path)  # Mark as recently used for pruning
+
+    todo = [i for i, image in enumerate(images) if image is None]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(todo) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            rendered = list(pool.map(render, [specs[i] for i in todo]))
+    else:
+        rendered = [render(specs[i]) for i in todo]
+
+    for i, image in zip(todo, rendered):
+        images[i] = image
+        if cache_folder:
+            path = os.path.join(cache_folder, f"{keys[i]}.png")
+            with open(path + '.tmp', 'wb') as f:
+                f.write(image)
+            os.replace(path + '.tmp', path)
+
+    if cache_folder:
+        prune_chart_cache(cache_folder)
+    return images
+
+
+# Native Excel charts.
+# Instead of embedding rendered PNGs, the workbook gets chart XML whose series reference
+# the data sheet directly, so Excel draws the lines itself: the file only grows by a few
+# kilobytes per chart and nothing has to be rendered at write time.
+#   'combined' - one multi-series line chart holding every chart column
+#   'separate' - one chart per column, stacked down the sheet (the matsep.py layout)
+CHART_LAYOUTS = ('combined', 'separate')
+
+# How charts get into the Graphs sheet:
+#   'native' - Excel line charts referencing the data sheet (see above)
+#   'image'  - matplotlib PNGs from render_charts (the finalcode.py path)
+CHART_MODES = ('native', 'image')
+
+# Sheet rows between the top-left corners of stacked charts, and chart size in cm
+NATIVE_CHART_ROWS = 20
+IMAGE_CHART_ROWS = 30
+COMBINED_CHART_SIZE = (30, 15)
+
+
+def chart_title(columns):
+    # "Graph of R5 Vs R1" for a single column, "Graph of R5 Vs R1 .. R5 Vs R4" for a combined chart
+    if len(columns) == 1:
+        return f"Graph of {columns[0]}"
+    return f"Graph of {columns[0]} .. {columns[-1]}"
+
+
+def chart_groups(columns, layout='combined'):
+    # Column groups that get one chart each
+    if layout == 'combined':
+        return [list(columns)] if columns else []
+    if layout == 'separate':
+        return [[column] for column in columns]
+    raise ValueError(f"Unknown chart layout {layout!r}, expected one of {CHART_LAYOUTS}")
+
+
+def add_openpyxl_line_chart(ws, data_ws, columns, last_row, title, anchor, size=None):
+    # Line chart on ws (normal or write-only sheet) with one series per data_ws column.
+    # columns are 1-based column numbers; the header on row 1 names the series, the
+    # values run from row 2 to last_row and column A supplies the category labels.
+    from openpyxl.chart import LineChart, Reference
+
+    chart = LineChart()
+    chart.title = title
+    chart.style = 13  # A predefined style for the chart
+    chart.x_axis.title = LINE_CHART_STYLE['xlabel']
+    chart.y_axis.title = LINE_CHART_STYLE['ylabel']
+    # openpyxl 3.1 hides the axes unless told otherwise
+    chart.x_axis.delete = False
+    chart.y_axis.delete = False
+    if size:
+        chart.width, chart.height = size
+
+    for column in columns:
+        chart.add_data(Reference(data_ws, min_col=column, min_row=1, max_row=last_row), titles_from_data=True)
+    chart.set_categories(Reference(data_ws, min_col=1, min_row=2, max_row=last_row))
+    ws.add_chart(chart, anchor)
+
+
+def add_xlsxwriter_line_chart(wb, ws, data_sheet, columns, last_row, title, anchor, size=None):
+    # The same chart for an xlsxwriter workbook (0-based columns and last_row)
+    chart = wb.add_chart({'type': 'line'})
+    for column in columns:
+        chart.add_series({
+            'name': [data_sheet, 0, column],
+            'categories': [data_sheet, 1, 0, last_row, 0],
+            'values': [data_sheet, 1, column, last_row, column],
+        })
+    chart.set_title({'name': title})
+    chart.set_style(13)
+    chart.set_x_axis({'name': LINE_CHART_STYLE['xlabel']})
+    chart.set_y_axis({'name': LINE_CHART_STYLE['ylabel']})
+    if size:
+        # xlsxwriter sizes charts in pixels (about 37.8 per cm)
+        chart.set_size({'width': round(size[0] * 37.8), 'height': round(size[1] * 37.8)})
+    ws.insert_chart(anchor, chart)
@@ -0,0 +1,150 @@
+import argparse
+import os
+
+from .cache import DEFAULT_CACHE_FOLDER
+from .charts import CHART_LAYOUTS, CHART_MODES, DEFAULT_CHART_CACHE
+from .join import DUPLICATE_POLICIES, MISSING_POSITIONS
+from .ingest import report_files
+from .model import MATRIX_DTYPES
+from .pipeline import run_pipeline
+from .shards import EXCEL_MAX_COLUMNS, EXCEL_MAX_ROWS
+from .styles import THRESHOLD_MODES, THRESHOLDS, VARIANCE_MODES
+from .variance import DEFAULT_PLAN, PLANS
+from .writer import BACKENDS
+
+# Command line entry point:
+#   python -m excelcomp [input_folder] [--report ...] [--filter-csv ...] [--graphs ...] [--matrix ...] [--watch]
+# Every requested artifact comes out of a single pipeline run (see excelcomp.pipeline);
+# without any artifact option the consolidated report is written. --watch keeps running
+# and rebuilds them whenever reports change (see excelcomp.watch).
+DEFAULT_REPORT = 'consolidated_report.xlsx'
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='excelcomp',
+                                     description="Consolidate performance reports into a styled workbook, "
+                                                 "a filtered CSV and graphs from one read of the input folder")
+    parser.add_argument('input_folder', nargs='?', default='./input_reports',
+                        help="folder holding the .xlsx reports, or raw .csv/.jtl result logs (one per run)")
+
+    artifacts = parser.add_argument_group('artifacts')
+    artifacts.add_argument('--report', metavar='XLSX', help=f"styled consolidated workbook (default {DEFAULT_REPORT})")
+    artifacts.add_argument('--filter-csv', metavar='CSV', help="per-report latency band tables")
+    artifacts.add_argument('--filter-bands', nargs='+', type=float, metavar='EDGE',
+                           help="band edges of the filter CSV in seconds (default: the thresholds)")
+    artifacts.add_argument('--graphs', metavar='FOLDER', help="PNG line charts of the latest run vs the others")
+    artifacts.add_argument('--matrix', metavar='FILE',
+                           help="typed run and variance matrix (.parquet, or .arrow/.feather for Arrow IPC)")
+
+    ingest = parser.add_argument_group('ingest and join')
+    ingest.add_argument('--workers', type=int, default=1, help="processes parsing the reports (0 = one per CPU)")
+    ingest.add_argument('--cache-folder', default=DEFAULT_CACHE_FOLDER, help="parse cache folder")
+    ingest.add_argument('--no-cache', action='store_true', help="parse every report again")
+    ingest.add_argument('--missing', choices=MISSING_POSITIONS, default='end',
+                        help="where transactions absent from Report 1 go")
+    ingest.add_argument('--duplicates', choices=DUPLICATE_POLICIES, default='first',
+                        help="how repeated transactions within a report are collapsed")
+    ingest.add_argument('--dtype', choices=MATRIX_DTYPES, default='float64',
+                        help="float type of the run and variance matrix (float32 halves its memory)")
+    ingest.add_argument('--metric-columns', nargs='+', metavar='COLUMN',
+                        help="report columns to consolidate, one sheet each ('all' = every numeric column); "
+                             "by default only the second column")
+
+    sheet = parser.add_argument_group('report')
+    sheet.add_argument('--comparison', nargs='+', choices=PLANS, default=list(DEFAULT_PLAN), help="variance plan")
+    sheet.add_argument('--thresholds', nargs=2, type=float, metavar=('LOW', 'HIGH'), default=list(THRESHOLDS),
+                       help="latency thresholds in seconds")
+    sheet.add_argument('--threshold-mode', choices=THRESHOLD_MODES, default='cells')
+    sheet.add_argument('--variance-mode', choices=VARIANCE_MODES, default='text')
+    sheet.add_argument('--backend', choices=BACKENDS, default='openpyxl')
+    sheet.add_argument('--charts', choices=CHART_MODES, help="add a Graphs sheet (native needs --variance-mode number)")
+    sheet.add_argument('--chart-layout', choices=CHART_LAYOUTS, default='combined')
+    sheet.add_argument('--sparklines', action='store_true', help="add a Trend sparkline per transaction")
+    sheet.add_argument('--chart-workers', type=int, default=1, help="processes rendering chart images (0 = one per CPU)")
+    sheet.add_argument('--chart-cache-folder', default=DEFAULT_CHART_CACHE, help="rendered chart cache folder")
+    sheet.add_argument('--max-rows', type=int, default=EXCEL_MAX_ROWS,
+                       help="rows per sheet, header included, before the table is split over more sheets")
+    sheet.add_argument('--max-columns', type=int, default=EXCEL_MAX_COLUMNS,
+                       help="columns per sheet before the table is split over more sheets")
+    sheet.add_argument('--shards-per-workbook', type=int, metavar='N',
+                       help="put at most N row shards in a workbook, writing report_2.xlsx and so on for the rest")
+
+    history = parser.add_argument_group('history')
+    history.add_argument('--history', metavar='FILE',
+                         help="append every report to this SQLite history (e.g. history.sqlite)")
+    history.add_argument('--history-tag', metavar='TAG', help="tag the newest report in the history")
+    history.add_argument('--last', type=int, metavar='N', help="consolidate the last N runs of the history")
+    history.add_argument('--baseline', metavar='TAG',
+                         help="consolidate against the latest history run tagged TAG (with --last, or the newest run)")
+
+    history.add_argument('--trend', metavar='PATH',
+                         help="append every report to this memory-mapped trend matrix (PATH.f32, .valid, .json)")
+    history.add_argument('--trend-last', type=int, metavar='N',
+                         help="consolidate the last N runs of the trend matrix, sliced from the mapping")
+
+    watch = parser.add_argument_group('watch')
+    watch.add_argument('--watch', action='store_true', help="keep running and rebuild the outputs as reports arrive")
+    # excelcomp.watch is only imported with --watch, so its modes and default are spelled out here
+    watch.add_argument('--watch-mode', default='auto', metavar='MODE',
+                       help="'inotify' (kernel events, Linux), 'poll' or 'auto' (inotify where available)")
+    watch.add_argument('--debounce', type=float, metavar='SECONDS',
+                       help="quiet time before a rebuild, and before a new report counts as complete (default 1)")
+
+    metrics = parser.add_argument_group('metrics')
+    metrics.add_argument('--metrics', metavar='FILE',
+                         help="per-stage timings, memory, rows and bytes as JSON (.ndjson appends one line per run)")
+    metrics.add_argument('--metrics-sheet', action='store_true', help="add the metrics to the report as a sheet")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    outputs = {'report': args.report, 'filter': args.filter_csv, 'graphs': args.graphs, 'matrix': args.matrix}
+    outputs = {artifact: path for artifact, path in outputs.items() if path}
+    if not outputs:
+        outputs = {'report': DEFAULT_REPORT}
+
+    if not os.path.isdir(args.input_folder):
+        parser.error(f"{args.input_folder} is not a folder")
+    # Ensure files are sorted by name
+    excel_files = report_files(args.input_folder)
+    if (args.last or args.baseline) and not args.history:
+        parser.error("--last and --baseline need --history")
+    if args.trend_last and not args.trend:
+        parser.error("--trend-last needs --trend")
+    if not excel_files and not (args.watch or args.last or args.baseline or args.trend_last):
+        parser.error(f"no .xlsx reports or result logs in {args.input_folder}")
+
+    options = dict(workers=args.workers or None, cache_folder=None if args.no_cache else args.cache_folder,
+                   missing=args.missing, duplicates=args.duplicates, dtype=args.dtype,
+                   comparison=tuple(args.comparison), thresholds=tuple(args.thresholds),
+                   threshold_mode=args.threshold_mode, variance_mode=args.variance_mode, backend=args.backend,
+                   charts=args.charts, chart_layout=args.chart_layout, sparklines=args.sparklines,
+                   chart_workers=args.chart_workers or None,
+                   chart_cache_folder=None if args.no_cache else args.chart_cache_folder,
+                   filter_bands=args.filter_bands, metrics_file=args.metrics, metrics_sheet=args.metrics_sheet,
+                   max_rows=args.max_rows, max_columns=args.max_columns,
+                   shards_per_workbook=args.shards_per_workbook,
+                   metric_columns='all' if args.metric_columns == ['all'] else args.metric_columns,
+                   history_file=args.history, history_tag=args.history_tag,
+                   history_last=args.last or (1 if args.baseline else None), history_baseline=args.baseline,
+                   trend_file=args.trend, trend_last=args.trend_last)
+    try:
+        if args.watch:
+            from .watch import watch_folder
+
+            if args.debounce is not None:
+                options['debounce'] = args.debounce
+            watch_folder(args.input_folder, outputs, mode=args.watch_mode, **options)
+            return 0
+        state = run_pipeline(excel_files, outputs, **options)
+    except (ValueError, ImportError) as exc:
+        parser.error(str(exc))
+
+    timings = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in state['timings'].items())
+    print(f"Consolidated {len(state['excel_files'])} report(s): {timings}")
+    for artifact, path in outputs.items():
+        print(f"  {artifact}: {path}")
+    return 0
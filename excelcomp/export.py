@@ -0,0 +1,102 @@
+import json
+import os
+
+import pandas as pd
+
+from .cache import file_digest
+from .styles import numeric
+
+# Columnar export of the consolidated matrix.
+# One table holds Transactions (string, null where a report row had no name), the runs
+# R1..Rn and the variance columns (float64, or float32 from a float32 matrix; missing
+# values as nulls), so analysis jobs get typed numbers instead of re-parsing the xlsx
+# and its "12.34 % ↑" strings.
+# The schema metadata, under METADATA_KEY, describes every run (source file, SHA-256)
+# and every variance column (its new and old run).
+#   .parquet         - compressed Parquet
+#   .arrow / .feather - uncompressed Arrow IPC, which read_matrix memory-maps
+# Needs pyarrow.
+MATRIX_FORMATS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+METADATA_KEY = b'excelcomp'
+
+
+def matrix_format(output_file):
+    extension = os.path.splitext(output_file)[1].lower()
+    if extension not in MATRIX_FORMATS:
+        raise ValueError(f"Unknown matrix format {extension!r}, expected one of {sorted(MATRIX_FORMATS)}")
+    return MATRIX_FORMATS[extension]
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ImportError("The matrix export needs the pyarrow package (pip install pyarrow)") from exc
+    return pyarrow
+
+
+def matrix_metadata(runs, variance_columns, excel_files, digests=None):
+    # Run and variance column descriptions stored with the table; digests, when known
+    # (runs loaded from the history store), save hashing the files again
+    digests = digests or [file_digest(file) for file in excel_files]
+    return {
+        'runs': [{'name': run, 'file': os.path.basename(file), 'sha256': digest}
+                 for run, file, digest in zip(runs, excel_files, digests)],
+        'variance': [dict(zip(('name', 'new', 'old'), [column] + column.split(' Vs ', 1)))
+                     for column in variance_columns],
+    }
+
+
+def matrix_table(merged_df, runs, variance_columns, metadata=None):
+    # Arrow table of the consolidated matrix with typed columns
+    pa = import_pyarrow()
+
+    names = [None if pd.isna(name) else str(name) for name in merged_df['Transactions'].tolist()]
+    arrays = [pa.array(names, type=pa.string())]
+    for column in list(runs) + list(variance_columns):
+        values = numeric(merged_df[column])
+        arrays.append(pa.array(values, type=pa.from_numpy_dtype(values.dtype), from_pandas=True))
+    schema = pa.schema([pa.field('Transactions', pa.string())] +
+                       [pa.field(column, array.type) for column, array in zip(list(runs) + list(variance_columns),
+                                                                             arrays[1:])])
+    if metadata is not None:
+        schema = schema.with_metadata({METADATA_KEY: json.dumps(metadata).encode()})
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_matrix(output_file, merged_df, runs, variance_columns, excel_files=(), digests=None):
+    # Write the matrix as Parquet or Arrow IPC depending on the file extension.
+    # The file is written next to output_file and moved into place, so readers never see half of it.
+    fmt = matrix_format(output_file)
+    table = matrix_table(merged_df, runs, variance_columns,
+                         matrix_metadata(runs, variance_columns, excel_files, digests))
+
+    folder = os.path.dirname(output_file)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, output_file + '.tmp')
+    else:
+        import pyarrow.feather as feather
+
+        feather.write_feather(table, output_file + '.tmp', compression='uncompressed')
+    os.replace(output_file + '.tmp', output_file)
+    return table.num_rows
+
+
+def read_matrix(input_file):
+    # (Arrow table, metadata dict) of an exported matrix; Arrow IPC files are memory-mapped
+    pa = import_pyarrow()
+
+    if matrix_format(input_file) == 'parquet':
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(input_file)
+    else:
+        import pyarrow.ipc as ipc
+
+        table = ipc.open_file(pa.memory_map(input_file)).read_all()
+    metadata = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b'{}'))
+    return table, metadata
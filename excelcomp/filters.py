@@ -0,0 +1,83 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from .styles import THRESHOLDS
+
+# Per-report latency band filter (the filter_transactions.py output).
+# Band edges split the latencies into N bands: [e1, e2), [e2, e3), ... [eN, inf);
+# rows below the first edge are not reported. Every report gets a heading and one
+# table per band, e.g. for the default edges (1.8, 2.0):
+#   Report 1: Filtered Data for Report1.xlsx
+#   Table: Transactions with 1.8 to <2 seconds
+#   Table: Transactions with >=2 seconds
+# The latencies are the report's second column, as everywhere else in the pipeline,
+# unless a column is named.
+
+
+def band_labels(edges=THRESHOLDS):
+    # "1.8 to <2 seconds" for each closed band, ">=2 seconds" for the last one
+    labels = [f"{low:g} to <{high:g} seconds" for low, high in zip(edges, edges[1:])]
+    return labels + [f">={edges[-1]:g} seconds"]
+
+
+def assign_bands(times, edges=THRESHOLDS):
+    # Band index per latency in one vectorized pass; -1 below the first edge or non-numeric
+    edges = np.asarray(edges, dtype=float)
+    if edges.ndim != 1 or len(edges) == 0 or np.any(np.diff(edges) <= 0):
+        raise ValueError(f"Band edges must be increasing, got {edges.tolist()}")
+    times = pd.to_numeric(times, errors="coerce").to_numpy(dtype=float)
+    bands = np.searchsorted(edges, times, side="right") - 1
+    bands[np.isnan(times)] = -1
+    return bands
+
+
+def latency_column(df, column=None):
+    # The column holding the latencies: column if given, else the report's second column
+    if column is None:
+        if len(df.columns) < 2:
+            raise ValueError("Report has no latency column after Transactions")
+        return df.columns[1]
+    if column not in df.columns:
+        raise ValueError(f"Report has no {column!r} column to filter on")
+    return column
+
+
+def filter_report(df, edges=THRESHOLDS, column=None):
+    # One DataFrame per band, each keeping the report's row order.
+    # Rows are grouped with a single stable sort of the band indices rather than one
+    # boolean mask per band. Times are converted to numbers like the band test.
+    column = latency_column(df, column)
+    df = df.assign(**{column: pd.to_numeric(df[column], errors="coerce")})
+    bands = assign_bands(df[column], edges)
+    order = np.argsort(bands, kind="stable")
+    counts = np.bincount(bands + 1, minlength=len(edges) + 1)  # Slot 0 counts the unreported rows
+    bounds = np.cumsum(counts)
+    return [df.iloc[order[bounds[band]:bounds[band + 1]]] for band in range(len(edges))]
+
+
+def write_filter_csv(output_file, file_names, report_dfs, edges=THRESHOLDS, filtered=None, column=None):
+    # Stream the band tables of every report into one CSV file, in the given order.
+    # report_dfs can be a generator, so only one report needs to be in memory at a time;
+    # filtered can hold the filter_report results already computed for report_dfs.
+    # Returns the number of transaction rows written.
+    folder = os.path.dirname(output_file)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    if filtered is None:
+        filtered = (filter_report(df, edges, column) for df in report_dfs)
+
+    labels = band_labels(edges)
+    written = 0
+    with open(output_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        for report_number, (file_name, band_dfs) in enumerate(zip(file_names, filtered), start=1):
+            writer.writerow([f"Report {report_number}: Filtered Data for {file_name}"])
+            for label, band_df in zip(labels, band_dfs):
+                writer.writerow([f"Table: Transactions with {label}"])
+                writer.writerows(band_df.itertuples(index=False, name=None))
+                writer.writerow([])  # Blank row for separation
+                written += len(band_df)
+    return written
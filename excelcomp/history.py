@@ -0,0 +1,186 @@
+import datetime
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from .cache import file_digest
+
+# Local history of every ingested report, in one SQLite file.
+# Each report is appended once (keyed by the SHA-256 of its contents) as a run, with
+# its column names and one sample per (row, metric column). Transaction names are
+# interned in their own table, and samples are indexed both by run (primary key) and
+# by (transaction, run), so consolidation can pull "the last N runs" or "this run vs
+# the one tagged baseline", or one transaction's whole history, straight from the file
+# without parsing any xlsx again. Runs come back as the same Transactions / metric
+# column DataFrames read_reports returns, in their original row order.
+DEFAULT_HISTORY_FILE = 'history.sqlite'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    digest TEXT NOT NULL UNIQUE,
+    tag TEXT,
+    added TEXT NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_tag ON runs (tag, run_id);
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL,
+    metric INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (run_id, metric)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL,
+    metric INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    transaction_id INTEGER,
+    value REAL,
+    PRIMARY KEY (run_id, metric, row)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS samples_transaction ON samples (transaction_id, run_id);
+'''
+
+
+class HistoryStore:
+    # Append-only store of parsed reports. A blank transaction name is kept as NULL;
+    # other names come back as strings, and values as floats (NaN for anything non-numeric).
+
+    def __init__(self, path=DEFAULT_HISTORY_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self._ids = None  # Transaction name -> ID, loaded on first append
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def _transaction_ids(self, names):
+        # IDs of the transaction names (None for a blank one), adding the new names
+        if self._ids is None:
+            self._ids = {name: i for i, name in self.db.execute('SELECT transaction_id, name FROM transactions')}
+        new = [name for name in dict.fromkeys(names) if name is not None and name not in self._ids]
+        if new:
+            last = self.db.execute('SELECT coalesce(max(transaction_id), 0) FROM transactions').fetchone()[0]
+            self.db.executemany('INSERT INTO transactions (name) VALUES (?)', ((name,) for name in new))
+            self._ids.update({name: i for i, name in self.db.execute(
+                'SELECT transaction_id, name FROM transactions WHERE transaction_id > ?', (last,))})
+        return [None if name is None else self._ids[name] for name in names]
+
+    def add_report(self, file, df, tag=None, digest=None):
+        # Append a parsed report as a run and return its ID. A file whose contents are
+        # already stored is not added again; its existing run (re-tagged with tag) is returned.
+        digest = digest or file_digest(file)
+        known = self.db.execute('SELECT run_id FROM runs WHERE digest = ?', (digest,)).fetchone()
+        if known:
+            if tag is not None:
+                self.tag_run(known[0], tag)
+            return known[0]
+        if df.shape[1] < 2:
+            raise ValueError(f"Report {file} has no metric column to store")
+
+        names = [None if pd.isna(name) else str(name) for name in df.iloc[:, 0].tolist()]
+        with self.db:
+            ids = self._transaction_ids(names)
+            added = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+            run_id = self.db.execute('INSERT INTO runs (file, digest, tag, added, rows) VALUES (?, ?, ?, ?, ?)',
+                                     (os.path.basename(file), digest, tag, added, len(df))).lastrowid
+            self.db.executemany('INSERT INTO metrics (run_id, metric, name) VALUES (?, ?, ?)',
+                                ((run_id, k, str(column)) for k, column in enumerate(df.columns[1:])))
+            rows = range(len(df))
+            for k in range(df.shape[1] - 1):
+                values = pd.to_numeric(df.iloc[:, k + 1], errors='coerce').to_numpy(dtype=np.float64)
+                values = [None if np.isnan(value) else value for value in values.tolist()]
+                self.db.executemany('INSERT INTO samples (run_id, metric, row, transaction_id, value) '
+                                    'VALUES (?, ?, ?, ?, ?)', zip([run_id] * len(df), [k] * len(df), rows, ids, values))
+        return run_id
+
+    def add_reports(self, files, report_dfs, tag=None, digests=None):
+        # Append reports in order and return their run IDs; tag goes on the last one
+        digests = digests or [None] * len(files)
+        return [self.add_report(file, df, tag if i == len(files) - 1 else None, digest)
+                for i, (file, df, digest) in enumerate(zip(files, report_dfs, digests))]
+
+    def stored(self, digests):
+        # The digests among digests whose reports are stored already
+        marks = ','.join('?' * len(digests))
+        return {digest for (digest,) in self.db.execute(f"SELECT digest FROM runs WHERE digest IN ({marks})",
+                                                          list(digests))}
+
+    def tag_run(self, run_id, tag):
+        with self.db:
+            self.db.execute('UPDATE runs SET tag = ? WHERE run_id = ?', (tag, run_id))
+
+    def runs(self):
+        # Every stored run, oldest first: run_id, file, digest, tag, added, rows
+        return pd.read_sql_query('SELECT * FROM runs ORDER BY run_id', self.db)
+
+    def select_runs(self, last=None, baseline=None):
+        # Run IDs of the last `last` runs (all of them by default), oldest first, preceded
+        # by the latest run tagged baseline when it is not among them already
+        if last is None:
+            query, parameters = 'SELECT run_id FROM runs ORDER BY run_id DESC', ()
+        else:
+            query, parameters = 'SELECT run_id FROM runs ORDER BY run_id DESC LIMIT ?', (last,)
+        run_ids = [run_id for (run_id,) in self.db.execute(query, parameters)][::-1]
+        if baseline is not None:
+            tagged = self.db.execute('SELECT max(run_id) FROM runs WHERE tag = ?', (baseline,)).fetchone()[0]
+            if tagged is None:
+                raise ValueError(f"No run in {self.path} is tagged {baseline!r}")
+            if tagged not in run_ids:
+                run_ids.insert(0, tagged)
+        return run_ids
+
+    def _run_column(self, run_ids, column):
+        marks = ','.join('?' * len(run_ids))
+        found = dict(self.db.execute(f"SELECT run_id, {column} FROM runs WHERE run_id IN ({marks})", list(run_ids)))
+        return [found[run_id] for run_id in run_ids]
+
+    def files(self, run_ids):
+        # Source file name of each run
+        return self._run_column(run_ids, 'file')
+
+    def digests(self, run_ids):
+        # SHA-256 of each run's source file
+        return self._run_column(run_ids, 'digest')
+
+    def report(self, run_id):
+        # One stored run as the DataFrame it was appended from
+        columns = [name for (name,) in self.db.execute('SELECT name FROM metrics WHERE run_id = ? ORDER BY metric',
+                                                       (run_id,))]
+        if not columns:
+            raise KeyError(f"No run {run_id} in {self.path}")
+        names = [name for (name,) in self.db.execute(
+            'SELECT t.name FROM samples s LEFT JOIN transactions t USING (transaction_id) '
+            'WHERE s.run_id = ? AND s.metric = 0 ORDER BY s.row', (run_id,))]
+        values = np.array([value for (value,) in self.db.execute(
+            'SELECT value FROM samples WHERE run_id = ? ORDER BY metric, row', (run_id,))], dtype=np.float64)
+        values = values.reshape(len(columns), len(names))
+        df = pd.DataFrame({'Transactions': pd.Series(names, dtype=object)})
+        for k, column in enumerate(columns):
+            df[column] = values[k]
+        return df
+
+    def reports(self, run_ids):
+        return [self.report(run_id) for run_id in run_ids]
+
+    def transaction_history(self, name, metric=0):
+        # One transaction's value in every run that has it (its first row there), oldest first,
+        # looked up through the (transaction, run) index
+        return pd.read_sql_query(
+            'SELECT r.run_id, r.file, r.tag, min(s.row) AS row, s.value FROM samples s JOIN runs r USING (run_id) '
+            'WHERE s.transaction_id = (SELECT transaction_id FROM transactions WHERE name = ?) AND s.metric = ? '
+            'GROUP BY s.run_id ORDER BY s.run_id', self.db, params=(str(name), metric)).drop(columns='row')
@@ -0,0 +1,183 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cache import file_digest
+from .ingest import read_reports
+from .model import ReportMatrix, build_matrix
+from .styles import THRESHOLDS
+from .writer import write_consolidated
+
+# Incremental consolidation.
+# The consolidated sheet is laid out as
+#   Transactions | R1 .. Rn | variance columns of the comparison plan
+# (the consecutive comparisons of final.py by default). The numeric matrix behind the
+# sheet is kept in a .npz state file next to it, so when report n+1 arrives only that
+# report is parsed: its column is added to the matrix (with rows for transactions first
+# seen in it) and the sheet is written again from the matrix in one streaming pass.
+# That costs the same as writing the sheet once; reopening the workbook, shifting
+# columns and saving it again cost more than the whole cold build.
+# The state also records the thresholds, threshold mode, variance mode and comparison
+# plan the sheet was written with; an update asking for other settings rebuilds the
+# sheet from the reports.
+
+
+def run_name(k):
+    return f'R{k}'
+
+
+def load_state(state_file):
+    # Return the saved consolidation state, or None if there is none (or it is unreadable)
+    try:
+        with np.load(state_file) as data:
+            return {
+                'transactions': data['transactions'].tolist(),
+                'values': data['values'],
+                'files': data['files'].tolist(),
+                'digests': data['digests'].tolist(),
+                'stats': data['stats'].tolist(),
+                'output_stat': data['output_stat'].tolist(),
+                'settings': {'thresholds': tuple(data['thresholds'].tolist()),
+                             'threshold_mode': str(data['threshold_mode']),
+                             'variance_mode': str(data['variance_mode']),
+                             'comparison': str(data['comparison'])},
+            }
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def save_state(state_file, state):
+    # Write the state atomically so an interrupted run leaves the previous one intact
+    with open(state_file + '.tmp', 'wb') as f:
+        np.savez(
+            f,
+            transactions=np.array(state['transactions'], dtype=str),
+            values=state['values'],
+            files=np.array(state['files'], dtype=str),
+            digests=np.array(state['digests'], dtype=str),
+            stats=np.array(state['stats'], dtype=np.int64).reshape(-1, 2),
+            output_stat=np.array(state['output_stat'], dtype=np.int64),
+            thresholds=np.array(state['settings']['thresholds'], dtype=float),
+            threshold_mode=np.array(state['settings']['threshold_mode']),
+            variance_mode=np.array(state['settings']['variance_mode']),
+            comparison=np.array(state['settings']['comparison']),
+        )
+    os.replace(state_file + '.tmp', state_file)
+
+
+def settings(thresholds=THRESHOLDS, threshold_mode='cells', variance_mode='text', comparison='consecutive'):
+    # The settings a sheet is built with and every update has to match
+    # (the comparison plan as JSON, so plan names and (new, old) pairs both compare)
+    return {'thresholds': tuple(float(value) for value in thresholds), 'threshold_mode': threshold_mode,
+            'variance_mode': variance_mode, 'comparison': json.dumps(comparison)}
+
+
+def file_stat(file):
+    stat = os.stat(file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def report_digest(file, cache=None):
+    # The cache already hashed every report it loaded or stored
+    return cache.digest(file) if cache is not None else file_digest(file)
+
+
+def unchanged_files(state, excel_files):
+    # True if the reports recorded in state are still the leading files of excel_files
+    # with the same contents. Only files whose size or mtime moved get re-hashed.
+    done = len(state['files'])
+    if not 0 < done <= len(excel_files):
+        return False
+    for file, saved_file, digest, stat in zip(excel_files, state['files'], state['digests'], state['stats']):
+        if os.path.abspath(file) != saved_file:
+            return False
+        if file_stat(file) != stat and file_digest(file) != digest:
+            return False
+    return True
+
+
+def write_state(output_file, state, comparison='consecutive', backend='openpyxl'):
+    # Write the whole sheet from the state matrix, styled with the state's settings
+    runs = [run_name(k) for k in range(1, state['values'].shape[1] + 1)]
+    matrix = ReportMatrix(pd.Index(state['transactions'], dtype=object), state['values'], np.isnan(state['values']), runs)
+    variance_columns, variances = matrix.variance(comparison)
+    write_consolidated(output_file, matrix.to_frame(variance_columns, variances), runs, variance_columns,
+                       backend=backend, thresholds=state['settings']['thresholds'],
+                       threshold_mode=state['settings']['threshold_mode'],
+                       variance_mode=state['settings']['variance_mode'])
+    state['output_stat'] = file_stat(output_file)
+
+
+def build(excel_files, output_file, state_file, workers=1, cache=None, duplicates='first', backend='openpyxl',
+          variance_mode='text', thresholds=THRESHOLDS, threshold_mode='cells', comparison='consecutive'):
+    # Cold path: consolidate every report and write the sheet from scratch
+    report_dfs = read_reports(excel_files, workers=workers, cache=cache)
+    matrix = build_matrix(report_dfs, [run_name(k) for k in range(1, len(excel_files) + 1)], duplicates=duplicates)
+    state = {
+        'transactions': matrix.names.astype(str).tolist(),
+        'values': matrix.values,
+        'files': [os.path.abspath(file) for file in excel_files],
+        'digests': [report_digest(file, cache) for file in excel_files],
+        'stats': [file_stat(file) for file in excel_files],
+        'settings': settings(thresholds, threshold_mode, variance_mode, comparison),
+    }
+    write_state(output_file, state, comparison, backend)
+    save_state(state_file, state)
+    return len(excel_files)
+
+
+def add_runs(state, new_dfs, duplicates='first'):
+    # Add the new reports' columns to the state matrix; transactions first seen in them
+    # get rows at the end, in the order a cold join would add them
+    new = build_matrix(new_dfs, duplicates=duplicates)
+    transactions = pd.Index(state['transactions'], dtype=object)
+    names = new.names.astype(str)
+    rows = transactions.get_indexer(names)
+    first_seen = rows < 0
+    rows[first_seen] = len(transactions) + np.arange(first_seen.sum())
+
+    n = state['values'].shape[1]
+    values = np.full((len(transactions) + first_seen.sum(), n + len(new_dfs)), np.nan, dtype=state['values'].dtype)
+    values[:len(transactions), :n] = state['values']
+    values[rows, n:] = new.values
+    state['transactions'] = state['transactions'] + names[first_seen].tolist()
+    state['values'] = values
+
+
+def append(state, new_files, output_file, workers=1, cache=None, duplicates='first', backend='openpyxl',
+           comparison='consecutive'):
+    # Warm path: parse only the new reports, add them to the saved matrix and write the sheet from it
+    add_runs(state, read_reports(new_files, workers=workers, cache=cache), duplicates)
+    state['files'] += [os.path.abspath(file) for file in new_files]
+    state['digests'] += [report_digest(file, cache) for file in new_files]
+    state['stats'] += [file_stat(file) for file in new_files]
+    write_state(output_file, state, comparison, backend)
+    return state
+
+
+def consolidate(excel_files, output_file, state_file=None, workers=1, cache=None, duplicates='first', backend='openpyxl',
+                variance_mode='text', thresholds=THRESHOLDS, threshold_mode='cells', comparison='consecutive'):
+    # Bring output_file up to date with excel_files.
+    # If the saved state covers a prefix of excel_files with unchanged contents, only the
+    # new reports are parsed and added; otherwise (first run, edited or removed report,
+    # missing output, an output rewritten by something else, or other settings) the
+    # sheet is rebuilt from every report.
+    # comparison is any variance plan (see excelcomp.variance.comparison_plan).
+    # Returns the number of reports that were (re)processed.
+    excel_files = list(excel_files)
+    state_file = state_file or os.path.splitext(output_file)[0] + '.state.npz'
+    state = load_state(state_file) if os.path.exists(output_file) else None
+
+    if (state is not None and state['settings'] == settings(thresholds, threshold_mode, variance_mode, comparison)
+            and unchanged_files(state, excel_files) and file_stat(output_file) == state['output_stat']):
+        new_files = excel_files[len(state['files']):]
+        if new_files:
+            state = append(state, new_files, output_file, workers=workers, cache=cache, duplicates=duplicates,
+                           backend=backend, comparison=comparison)
+            save_state(state_file, state)
+        return len(new_files)
+
+    return build(excel_files, output_file, state_file, workers=workers, cache=cache, duplicates=duplicates, backend=backend,
+                 variance_mode=variance_mode, thresholds=thresholds, threshold_mode=threshold_mode, comparison=comparison)
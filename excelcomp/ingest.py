@@ -0,0 +1,98 @@
+import os
+import time
+
+import pandas as pd
+
+# Raw result logs, streamed into reports by excelcomp.logs (imported only when one is read)
+LOG_EXTENSIONS = ('.csv', '.jtl')
+
+# Files of an input folder taken as reports, one per run
+REPORT_EXTENSIONS = ('.xlsx',) + LOG_EXTENSIONS
+
+
+def is_log(file):
+    return os.path.splitext(file)[1].lower() in LOG_EXTENSIONS
+
+
+def is_report_name(name):
+    # Excel's "~$" lock files next to an open workbook and hidden files are not reports
+    return os.path.splitext(name)[1].lower() in REPORT_EXTENSIONS and not name.startswith(('~$', '.'))
+
+
+def report_files(folder):
+    # Reports and result logs in folder, sorted by name (the run order)
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if is_report_name(name))
+
+
+def read_report(file):
+    # Read one report into a DataFrame, assuming the first row has headers.
+    # A raw result log (.csv, .jtl) is streamed into the same two-column report (see excelcomp.logs).
+    if is_log(file):
+        from .logs import log_report
+
+        return log_report(file)
+    return pd.read_excel(file, header=0)
+
+
+def timed_read_report(file):
+    # read_report plus the wall and CPU seconds it took (measured in the worker process)
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    df = read_report(file)
+    return df, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def record_report(metrics, stage, file, df, seconds, cpu_seconds, bytes_read=0):
+    if metrics is not None:
+        metrics.add(stage, seconds, cpu_seconds, detail=os.path.basename(file), rows=len(df), cells=int(df.size),
+                    bytes_read=bytes_read)
+
+
+def read_reports(excel_files, workers=1, cache=None, metrics=None):
+    # Parse every report and return the DataFrames in the same order as excel_files.
+    # workers > 1 parses the files in a process pool (None = one process per CPU core).
+    # The pool re-imports the calling script wherever it does not fork (Windows, macOS,
+    # and Linux from Python 3.14 on), so the caller's work must sit under
+    # `if __name__ == "__main__":`, as it does in the scripts.
+    # With a ReportCache, files whose contents were parsed before are loaded from it
+    # and only the remaining ones are parsed.
+    # With a Metrics recorder, every parsed report gets a 'read_excel' (or, for a log,
+    # 'read_log') record and every cached one a 'read_cache' record (see excelcomp.metrics).
+    excel_files = list(excel_files)
+    report_dfs = []
+    for file in excel_files:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        df = cache.load(file) if cache is not None else None
+        if df is not None:
+            record_report(metrics, 'read_cache', file, df, time.perf_counter() - wall, time.process_time() - cpu)
+        report_dfs.append(df)
+    to_parse = [file for file, df in zip(excel_files, report_dfs) if df is None]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(to_parse))
+
+    if workers <= 1:
+        parsed = [timed_read_report(file) for file in to_parse]
+    else:
+        # Executor.map yields results in submission order, so the sorted file order is kept.
+        # The pool machinery is only imported when it is used.
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(timed_read_report, to_parse))
+
+    # Put the parsed reports back into the slots the cache could not fill
+    parsed = iter(parsed)
+    for i, file in enumerate(excel_files):
+        if report_dfs[i] is None:
+            report_dfs[i], seconds, cpu_seconds = next(parsed)
+            stage = 'read_log' if is_log(file) else 'read_excel'
+            record_report(metrics, stage, file, report_dfs[i], seconds, cpu_seconds, os.path.getsize(file))
+            if cache is not None:
+                cache.store(file, report_dfs[i])
+
+    if cache is not None:
+        cache.save()
+    return report_dfs
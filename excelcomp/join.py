@@ -0,0 +1,30 @@
+from .model import DUPLICATE_POLICIES, MISSING_POSITIONS, build_matrix
+
+
+def index_report(df, duplicates='first'):
+    # Turn a two-column report into a Series of values indexed by transaction name
+    series = df.set_index(df.columns[0])[df.columns[1]]
+
+    if series.index.has_duplicates:
+        if duplicates == 'error':
+            repeated = series.index[series.index.duplicated()].unique().tolist()
+            raise ValueError(f"Duplicate transaction names in report: {repeated}")
+        if duplicates in ('first', 'last'):
+            series = series[~series.index.duplicated(keep=duplicates)]
+        elif duplicates in DUPLICATE_POLICIES:
+            series = series.groupby(level=0, sort=False).agg(duplicates)
+        else:
+            raise ValueError(f"Unknown duplicates policy {duplicates!r}, expected one of {DUPLICATE_POLICIES}")
+
+    return series
+
+
+def join_reports(report_dfs, columns, missing='end', duplicates='first', dtype='float64'):
+    # Join all reports on Transactions in a single aligned pass.
+    # Rows follow Report 1's order. Transactions missing from Report 1 are either
+    # appended after it in the order they are first seen ('end') or dropped ('drop').
+    # The join runs on interned transaction IDs (see excelcomp.model); the run columns
+    # come back as dtype floats, NaN where a report has no value.
+    if len(columns) != len(report_dfs):
+        raise ValueError(f"Got {len(columns)} column names for {len(report_dfs)} reports")
+    return build_matrix(report_dfs, columns, missing=missing, duplicates=duplicates, dtype=dtype).to_frame()
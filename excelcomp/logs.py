@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+from .sketch import SKETCH_ACCURACY, QuantileSketch
+
+# Raw result logs as reports.
+# A log lists every sample of a run, one per line: JMeter's JTL as CSV (timeStamp,
+# elapsed, label, ..., success) or as XML (<httpSample t=".." lb=".." s=".."/>), or any
+# CSV with label and elapsed columns. It is read in chunks of LOG_CHUNK_ROWS samples into
+# a QuantileSketch, so a multi-GB log never has to fit in memory, and comes out as the
+# same two-column Transactions / time(90%) report as an xlsx export. Transactions keep
+# the order they first appear in the log.
+LOG_CHUNK_ROWS = 1000000
+
+# Header names looked up case-insensitively in CSV logs; success is optional
+LOG_COLUMNS = {'label': 'label', 'elapsed': 'elapsed', 'success': 'success'}
+
+# Quantile reported as the time(90%) column, and the unit of the elapsed column (JTL: ms)
+LOG_QUANTILE = 0.90
+ELAPSED_SECONDS = 0.001
+
+# Samples in XML JTL files; nested ones are sub-results of the sample around them
+XML_SAMPLES = ('httpSample', 'sample')
+
+
+def is_xml_log(file):
+    # JTL files are XML when their first non-blank character opens a tag
+    with open(file, 'rb') as f:
+        return f.read(512).lstrip().startswith(b'<')
+
+
+def elapsed_values(values):
+    # Elapsed column as float64, anything unparsable as NaN (skipped by the sketch)
+    return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+
+
+def csv_log_chunks(file, chunk_rows=LOG_CHUNK_ROWS):
+    # (labels, elapsed, success) arrays of consecutive samples of a CSV log
+    header = pd.read_csv(file, nrows=0).columns
+    by_name = {str(column).strip().lower(): column for column in header}
+    missing = [name for key, name in LOG_COLUMNS.items() if key != 'success' and name not in by_name]
+    if missing:
+        raise ValueError(f"Log {file} has no {' or '.join(missing)} column")
+    label, elapsed = by_name[LOG_COLUMNS['label']], by_name[LOG_COLUMNS['elapsed']]
+    success = by_name.get(LOG_COLUMNS['success'])
+
+    columns = [label, elapsed] + ([success] if success is not None else [])
+    dtypes = {column: str for column in (label, success) if column is not None}
+    for chunk in pd.read_csv(file, usecols=columns, dtype=dtypes, chunksize=chunk_rows):
+        if success is None:
+            ok = np.ones(len(chunk), dtype=bool)
+        else:
+            ok = (chunk[success].str.strip().str.lower() == 'true').to_numpy()
+        yield chunk[label], elapsed_values(chunk[elapsed]), ok
+
+
+def xml_log_chunks(file, chunk_rows=LOG_CHUNK_ROWS):
+    # The same for an XML JTL file, counting only top-level samples
+    import xml.etree.ElementTree as ElementTree
+
+    labels, elapsed, ok = [], [], []
+    depth = 0
+    context = ElementTree.iterparse(file, events=('start', 'end'))
+    _, root = next(context)
+    for event, element in context:
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 0:
+            if element.tag in XML_SAMPLES:
+                labels.append(element.get('lb'))
+                elapsed.append(element.get('t'))
+                ok.append(element.get('s', 'true') == 'true')
+            # Drop finished samples (and their sub-results) so memory stays flat
+            root.clear()
+            if len(labels) >= chunk_rows:
+                yield pd.Series(labels, dtype=object), elapsed_values(elapsed), np.array(ok, dtype=bool)
+                labels, elapsed, ok = [], [], []
+    if labels:
+        yield pd.Series(labels, dtype=object), elapsed_values(elapsed), np.array(ok, dtype=bool)
+
+
+def sketch_log(file, accuracy=SKETCH_ACCURACY, include_failures=True, chunk_rows=LOG_CHUNK_ROWS, sketch=None):
+    # QuantileSketch of a log's latencies in seconds, optionally added to an existing one.
+    # Failed samples count by default, as in JMeter's aggregate report.
+    sketch = sketch if sketch is not None else QuantileSketch(accuracy)
+    chunks = xml_log_chunks if is_xml_log(file) else csv_log_chunks
+    for labels, elapsed, ok in chunks(file, chunk_rows):
+        if not include_failures:
+            labels, elapsed = labels[ok], elapsed[ok]
+        sketch.add(labels, elapsed * ELAPSED_SECONDS)
+    return sketch
+
+
+def log_column(quantile=LOG_QUANTILE):
+    # 'time(90%)' for 0.9
+    return f'time({quantile * 100:g}%)'
+
+
+def log_report(file, quantile=LOG_QUANTILE, accuracy=SKETCH_ACCURACY, include_failures=True):
+    # Transactions / time(q) report of a log, as read_report returns for an xlsx.
+    # Latencies are rounded to the millisecond the logs are recorded in.
+    sketch = sketch_log(file, accuracy, include_failures)
+    return pd.DataFrame({'Transactions': list(sketch.names),
+                         log_column(quantile): sketch.quantile(quantile).round(3)})
@@ -0,0 +1,142 @@
+import datetime
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module; peak RSS is then not reported
+    resource = None
+
+# Per-stage instrumentation.
+# Every stage of a run gets one record with its wall and CPU time, the process's peak
+# RSS when it finished and how much the stage raised it, plus the rows, cells and
+# file bytes it read or wrote. Taking a record costs two clock reads and two
+# getrusage calls, so it stays on in production runs.
+# Records are kept in the order the stages started. A stage that runs inside another
+# (read_excel inside ingest, style inside write) names it as its parent and is
+# included in the parent's times.
+COUNTERS = ('rows', 'cells', 'bytes_read', 'bytes_written')
+
+# Columns of the summary sheet, as (heading, record key)
+SUMMARY_COLUMNS = [
+    ('Stage', 'stage'), ('Detail', 'detail'), ('Parent', 'parent'), ('Seconds', 'seconds'),
+    ('CPU seconds', 'cpu_seconds'), ('Peak RSS MB', 'peak_rss_mb'), ('RSS growth MB', 'rss_growth_mb'), ('Rows', 'rows'), ('Cells', 'cells'),
+    ('Bytes read', 'bytes_read'), ('Bytes written', 'bytes_written'),
+]
+
+
+def peak_rss_mb():
+    # High-water mark of the process's resident memory; ru_maxrss is in KiB on Linux, bytes on macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def file_size(path):
+    # Size of a file, or of every file in a folder
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+class Metrics:
+    # Records of one run, filled in by stage() blocks, timed_iter() and add()
+
+    def __init__(self):
+        self.started = datetime.datetime.now(datetime.timezone.utc)
+        self.records = []
+        self._open = []  # Names of the stage() blocks currently running, outermost first
+
+    def _new_record(self, name, detail):
+        record = {'stage': name, 'detail': detail, 'parent': self._open[-1] if self._open else None,
+                  **{counter: 0 for counter in COUNTERS}}
+        self.records.append(record)
+        return record
+
+    @contextmanager
+    def stage(self, name, detail=None):
+        # Measure the block; it can add to the counters of the record it gets
+        record = self._new_record(name, detail)
+        self._open.append(name)
+        rss = peak_rss_mb()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            self._finish(record, time.perf_counter() - wall, time.process_time() - cpu, rss)
+            self._open.pop()
+
+    def _finish(self, record, seconds, cpu_seconds, rss):
+        peak = peak_rss_mb()
+        record['seconds'] = round(seconds, 6)
+        record['cpu_seconds'] = round(cpu_seconds, 6)
+        record['peak_rss_mb'] = None if peak is None else round(peak, 1)
+        record['rss_growth_mb'] = None if peak is None else round(peak - rss, 1)
+
+    def add(self, name, seconds, cpu_seconds, detail=None, **counters):
+        # Record work measured elsewhere, e.g. a report parsed in a worker process
+        record = self._new_record(name, detail)
+        record.update(counters)
+        record['seconds'] = round(seconds, 6)
+        record['cpu_seconds'] = round(cpu_seconds, 6)
+        record['peak_rss_mb'] = record['rss_growth_mb'] = None  # Not this process's memory
+        return record
+
+    def timed_iter(self, name, items, cells=len):
+        # Wrap a lazy iterable (such as styled rows) so the time spent producing its items is
+        # recorded as its own stage, together with the items produced and cells(item) summed.
+        # The record is opened on the first item, inside whichever stage consumes it.
+        record = self._new_record(name, None)
+        rss = peak_rss_mb()
+        seconds = cpu_seconds = 0.0
+        iterator = iter(items)
+        while True:
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.perf_counter() - wall
+                cpu_seconds += time.process_time() - cpu
+            record['rows'] += 1
+            record['cells'] += cells(item)
+            yield item
+        self._finish(record, seconds, cpu_seconds, rss)
+
+    def summary(self):
+        # Run-level record holding every stage record
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'seconds': round(sum(r.get('seconds', 0) for r in self.records if r['parent'] is None), 6),
+            'peak_rss_mb': max((r['peak_rss_mb'] for r in self.records if r.get('peak_rss_mb') is not None),
+                               default=None),
+            'stages': self.records,
+        }
+
+    def summary_rows(self):
+        # Header plus one row per record for a summary sheet
+        rows = [[heading for heading, _ in SUMMARY_COLUMNS]]
+        for record in self.records:
+            rows.append([record.get(key) for _, key in SUMMARY_COLUMNS])
+        return rows
+
+
+def write_metrics(metrics_file, summary):
+    # .ndjson appends the run as one line (a history of runs); anything else is overwritten as JSON
+    folder = os.path.dirname(metrics_file)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    if metrics_file.endswith('.ndjson'):
+        with open(metrics_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(summary) + '\n')
+    else:
+        with open(metrics_file + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(metrics_file + '.tmp', metrics_file)
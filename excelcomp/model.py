@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+from .variance import DEFAULT_PLAN, comparison_plan, variance_matrix, variance_name
+
+# Compact core model of the consolidated matrix.
+# Transaction names are interned once into an integer-ID dictionary (names[i] is
+# transaction i), and the latencies live in one contiguous transactions x runs NumPy
+# array (float64, or float32 to halve it) with a separate boolean missing mask.
+# Joining works on the integer IDs and typed arrays only; a DataFrame is built at the
+# end, as views of the arrays, for the writers that need one.
+MATRIX_DTYPES = ('float64', 'float32')
+
+# Where transactions that are not in Report 1 end up in the joined matrix
+MISSING_POSITIONS = ('end', 'drop')
+
+# How repeated transaction names inside one report are collapsed
+DUPLICATE_POLICIES = ('first', 'last', 'mean', 'max', 'min', 'error')
+
+
+class ReportMatrix:
+    # names: Index of transaction names by ID; values: float array, NaN where missing; missing: bool mask
+
+    def __init__(self, names, values, missing, runs):
+        self.names = names
+        self.values = values
+        self.missing = missing
+        self.runs = list(runs)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        # Memory held by the names and the arrays
+        return self.names.nbytes + self.values.nbytes + self.missing.nbytes
+
+    def variance(self, plan=DEFAULT_PLAN, baseline=None):
+        # (variance column names, transactions x pairs array) of a comparison plan, in the matrix dtype
+        pairs = comparison_plan(self.runs, plan, baseline)
+        if not pairs:
+            return [], np.empty((len(self), 0), dtype=self.values.dtype)
+        return [variance_name(a, b) for a, b in pairs], variance_matrix(self.values, self.runs, pairs)
+
+    def to_frame(self, variance_columns=(), variances=None):
+        # merged_df for the writers: Transactions, the runs and any variance columns.
+        # The numeric columns wrap the arrays rather than copying them.
+        frames = [pd.DataFrame({'Transactions': self.names}),
+                  pd.DataFrame(self.values, columns=self.runs, copy=False)]
+        if len(variance_columns):
+            frames.append(pd.DataFrame(variances, columns=list(variance_columns), copy=False))
+        return pd.concat(frames, axis=1)
+
+
+class MetricCube:
+    # Several metrics per transaction and run (p50, p95, throughput, error rate, ...) in one
+    # metrics x transactions x runs array. Metric-major, so each metric's transactions x runs
+    # slice is a contiguous ReportMatrix view, and the variance of every metric is one
+    # broadcast over the whole cube.
+
+    def __init__(self, names, values, missing, runs, metrics):
+        self.names = names
+        self.values = values
+        self.missing = missing
+        self.runs = list(runs)
+        self.metrics = list(metrics)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        return self.names.nbytes + self.values.nbytes + self.missing.nbytes
+
+    def matrix(self, metric):
+        # ReportMatrix view of one metric
+        k = self.metrics.index(metric)
+        return ReportMatrix(self.names, self.values[k], self.missing[k], self.runs)
+
+    def variance(self, plan=DEFAULT_PLAN, baseline=None):
+        # (variance column names, metrics x transactions x pairs array) of a comparison plan
+        pairs = comparison_plan(self.runs, plan, baseline)
+        if not pairs:
+            return [], np.empty(self.values.shape[:2] + (0,), dtype=self.values.dtype)
+        return [variance_name(a, b) for a, b in pairs], variance_matrix(self.values, self.runs, pairs)
+
+
+def report_metric_columns(report_dfs, metrics='all'):
+    # Metric columns to carry: every column after Transactions holding at least one number
+    # in some report ('all', in the order first seen), or the given column names
+    if metrics != 'all':
+        metrics = list(metrics)
+        absent = [metric for metric in metrics if not any(metric in df.columns[1:] for df in report_dfs)]
+        if absent:
+            raise ValueError(f"No report has the metric columns {absent}")
+        return metrics
+    found = {}
+    for df in report_dfs:
+        for column in df.columns[1:]:
+            if column not in found or not found[column]:
+                found[column] = bool(pd.to_numeric(df[column], errors='coerce').notna().any())
+    return [column for column, numeric in found.items() if numeric]
+
+
+def report_values(df, metrics=None):
+    # (names, float64 rows x metrics values) of a report: its second column, or the named
+    # metric columns (NaN where the report lacks one); non-numeric values become NaN
+    if metrics is None:
+        columns = [df.iloc[:, 1]]
+    else:
+        columns = [df[metric] if metric in df.columns[1:] else pd.Series(np.nan, index=df.index)
+                   for metric in metrics]
+    values = np.column_stack([pd.to_numeric(column, errors='coerce').to_numpy(dtype=np.float64)
+                              for column in columns]) if columns else np.empty((len(df), 0))
+    return df.iloc[:, 0], values
+
+
+def collapse_duplicates(ids, values, duplicates='first', names=None):
+    # One (id, value row) per transaction ID of a report, as index_report does for names
+    unique, first = np.unique(ids, return_index=True)
+    if len(unique) == len(ids):
+        return ids, values
+    if duplicates == 'error':
+        repeated = np.unique(ids[np.setdiff1d(np.arange(len(ids)), first)])
+        raise ValueError(f"Duplicate transaction names in report: {names[repeated].tolist()}")
+    if duplicates == 'first':
+        return ids[first], values[first]
+    if duplicates == 'last':
+        last = len(ids) - 1 - np.unique(ids[::-1], return_index=True)[1]
+        return ids[last], values[last]
+    if duplicates in ('mean', 'max', 'min'):
+        collapsed = pd.DataFrame(values).groupby(ids, sort=True).agg(duplicates)
+        return collapsed.index.to_numpy(), collapsed.to_numpy(dtype=np.float64)
+    raise ValueError(f"Unknown duplicates policy {duplicates!r}, expected one of {DUPLICATE_POLICIES}")
+
+
+def join_values(report_dfs, runs, metrics=None, missing='end', duplicates='first', dtype='float64'):
+    # Intern every report's transactions and fill a metrics x transactions x runs array in
+    # one pass per report. Returns (names, values, missing mask, runs); without metrics the
+    # single metric is each report's second column.
+    # Row order matches join_reports: Report 1's transactions first, then ('end') the ones
+    # first seen in later reports, in the order they appear, or ('drop') none of them.
+    if missing not in MISSING_POSITIONS:
+        raise ValueError(f"Unknown missing position {missing!r}, expected one of {MISSING_POSITIONS}")
+    if duplicates not in DUPLICATE_POLICIES:
+        raise ValueError(f"Unknown duplicates policy {duplicates!r}, expected one of {DUPLICATE_POLICIES}")
+    if dtype not in MATRIX_DTYPES:
+        raise ValueError(f"Unknown matrix dtype {dtype!r}, expected one of {MATRIX_DTYPES}")
+    runs = list(runs) if runs is not None else [f'R{i}' for i in range(1, len(report_dfs) + 1)]
+    if len(runs) != len(report_dfs):
+        raise ValueError(f"Got {len(runs)} run names for {len(report_dfs)} reports")
+    depth = 1 if metrics is None else len(metrics)
+    if not report_dfs:
+        return (pd.Index([], dtype=object), np.empty((depth, 0, 0), dtype=dtype), np.empty((depth, 0, 0), dtype=bool),
+                [])
+
+    columns = [report_values(df, metrics) for df in report_dfs]
+    # factorize numbers names in order of first appearance, so Report 1's names get the lowest IDs
+    # (a blank name is a transaction of its own, as it is in a pandas index). It runs on the
+    # name columns as they are, so Arrow-backed strings are never turned into Python objects.
+    all_names = pd.concat([report_names for report_names, _ in columns], ignore_index=True)
+    ids, names = pd.factorize(all_names, use_na_sentinel=False)
+    if missing == 'drop':
+        kept = int(ids[:len(columns[0][0])].max()) + 1 if len(columns[0][0]) else 0
+    else:
+        kept = len(names)
+
+    values = np.full((depth, kept, len(runs)), np.nan, dtype=dtype)
+    seen = np.zeros((kept, len(runs)), dtype=bool)
+    start = 0
+    for k, (report_names, report_values_) in enumerate(columns):
+        report_ids = ids[start:start + len(report_names)]
+        start += len(report_names)
+        report_ids, report_values_ = collapse_duplicates(report_ids, report_values_, duplicates, names)
+        inside = report_ids < kept
+        values[:, report_ids[inside], k] = report_values_[inside].T
+        seen[report_ids[inside], k] = True
+
+    # A listed transaction with a non-numeric value counts as missing too
+    return names[:kept], values, ~seen | np.isnan(values), runs
+
+
+def build_matrix(report_dfs, runs=None, missing='end', duplicates='first', dtype='float64'):
+    # Transactions x runs matrix of every report's second column (see join_values)
+    names, values, missing_, runs = join_values(report_dfs, runs, None, missing, duplicates, dtype)
+    return ReportMatrix(names, values[0], missing_[0], runs)
+
+
+def build_cube(report_dfs, runs=None, metrics='all', missing='end', duplicates='first', dtype='float64'):
+    # Metrics x transactions x runs cube of the reports' metric columns (see report_metric_columns)
+    metrics = report_metric_columns(report_dfs, metrics)
+    names, values, missing_, runs = join_values(report_dfs, runs, metrics, missing, duplicates, dtype)
+    return MetricCube(names, values, missing_, runs, metrics)
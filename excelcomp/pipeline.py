@@ -0,0 +1,350 @@
+import os
+
+from .cache import DEFAULT_CACHE_FOLDER, ReportCache, file_digest
+from .charts import DEFAULT_CHART_CACHE, chart_title, line_chart_spec, render_charts
+from .filters import filter_report, write_filter_csv
+from .ingest import read_reports
+from .metrics import Metrics, file_size, write_metrics
+from .model import build_cube, build_matrix, report_metric_columns
+from .shards import EXCEL_MAX_COLUMNS, EXCEL_MAX_ROWS, plan_shards
+from .styles import THRESHOLDS
+from .variance import DEFAULT_PLAN
+from .writer import metric_tables, sheet_header, styled_rows, write_consolidated
+
+# Staged consolidation pipeline.
+# One run reads the reports once and feeds every requested artifact from the same
+# in-memory data, instead of each script re-reading input_reports on its own:
+#   ingest   - parse the reports (process pool and parse cache, see read_reports), append
+#              them to the trend matrix and history store and optionally consolidate
+#              stored runs instead
+#   join     - one Transactions x R1..Rn matrix on interned IDs (see excelcomp.model), or
+#              with metric_columns a metrics x Transactions x R1..Rn cube
+#   variance - the variance columns of the comparison plan, computed on the matrix array
+#              (for every metric of the cube at once)
+#   filter   - per-report latency band tables for the CSV
+#   style    - styled rows of the consolidated sheet, produced lazily as they are written
+#   render   - chart PNGs, rendered once for both the graphs folder and the report
+#   write    - every requested artifact
+# A stage only runs when one of the requested artifacts needs it.
+STAGES = ('ingest', 'join', 'variance', 'filter', 'style', 'render', 'write')
+
+# Artifacts and the stages they need besides ingest and write
+#   report - styled consolidated workbook (final.py), optionally with charts and sparklines
+#   filter - CSV of per-report latency band tables (filter_transactions.py)
+#   graphs - folder of PNG line charts of the latest run vs the others (finalcode.py)
+#   matrix - typed run and variance matrix as Parquet or Arrow IPC (see excelcomp.export)
+ARTIFACTS = {
+    'report': ('join', 'variance', 'style'),
+    'filter': ('filter',),
+    'graphs': ('join', 'variance', 'render'),
+    'matrix': ('join', 'variance'),
+}
+
+
+def graph_columns(runs, variance_columns):
+    # Comparisons of the latest run against the others (R5 Vs R1 .. R5 Vs R4 for five reports)
+    return [c for c in variance_columns if c.startswith(f'{runs[-1]} Vs ')]
+
+
+def pipeline_stages(outputs, charts=None):
+    # Stages needed for the requested outputs, in pipeline order
+    unknown = set(outputs) - set(ARTIFACTS)
+    if unknown:
+        raise ValueError(f"Unknown artifacts {sorted(unknown)}, expected some of {list(ARTIFACTS)}")
+    needed = {'ingest', 'write'}
+    for artifact in outputs:
+        needed.update(ARTIFACTS[artifact])
+    if 'report' in outputs and charts == 'image':
+        needed.add('render')
+    return [stage for stage in STAGES if stage in needed]
+
+
+def stored_digests(options, digests):
+    # Digests of the reports that the history, and the trend store if there is one, already hold
+    from .history import HistoryStore
+
+    with HistoryStore(options['history_file']) as store:
+        stored = store.stored(digests)
+    if options['trend_file'] and stored:
+        from .trend import TrendMatrix
+
+        stored &= {run['digest'] for run in TrendMatrix(options['trend_file']).runs}
+    return stored
+
+
+def ingest_stage(state, record):
+    options = state['options']
+    cache_folder = options['cache_folder']
+    cache = options['report_cache'] or (ReportCache(cache_folder) if cache_folder else None)
+    files = state['excel_files']
+    # Digests for the stores and the matrix metadata, reusing the ones the cache knows
+    digests = None
+    if options['history_file'] or options['trend_file'] or 'matrix' in state['outputs']:
+        digests = [cache.digest(file) if cache is not None else file_digest(file) for file in files]
+    state['digests'] = digests
+
+    # Consolidating from the history reads the selected runs back from the store, so only
+    # the reports a store does not hold yet are parsed (the rest stay None here)
+    parse = range(len(files))
+    if options['history_file'] and (options['history_last'] or options['history_baseline']):
+        stored = stored_digests(options, digests)
+        parse = [i for i, digest in enumerate(digests) if digest not in stored]
+    report_dfs = [None] * len(files)
+    parsed = read_reports([files[i] for i in parse], workers=options['workers'], cache=cache, metrics=state['metrics'])
+    for i, df in zip(parse, parsed):
+        report_dfs[i] = df
+    state['report_dfs'] = report_dfs
+    record['bytes_read'] = sum(file_size(files[i]) for i in parse)
+
+    # The stores get the files actually ingested, before a history selection replaces them
+    if options['trend_file']:
+        from .trend import TrendMatrix
+
+        with state['metrics'].stage('trend') as trend:
+            matrix = TrendMatrix(options['trend_file'])
+            for file, df, digest in zip(files, report_dfs, digests):
+                matrix.append(df, file=file, digest=digest, duplicates=options['duplicates'])
+            trend['rows'] = sum(len(df) for df in parsed)
+            if options['trend_last']:
+                # The join slices the mapped matrix instead of joining the reports
+                selected = matrix.runs[matrix.run_range(options['trend_last'])]
+                state['trend'] = matrix
+                state['excel_files'] = [run['file'] for run in selected]
+                state['digests'] = [run['digest'] for run in selected]
+    if options['history_file']:
+        from .history import HistoryStore
+
+        with state['metrics'].stage('history') as history, HistoryStore(options['history_file']) as store:
+            store.add_reports(files, report_dfs, options['history_tag'], digests)
+            if options['history_last'] or options['history_baseline']:
+                # Consolidate the selected stored runs; their file names stand in for the input files
+                run_ids = store.select_runs(options['history_last'], options['history_baseline'])
+                state['report_dfs'] = store.reports(run_ids)
+                state['excel_files'] = store.files(run_ids)
+                state['digests'] = store.digests(run_ids)
+            history['rows'] = sum(len(df) for df in state['report_dfs'])
+    record['rows'] = sum(len(df) for df in state['report_dfs'])
+    record['cells'] = sum(int(df.size) for df in state['report_dfs'])
+
+
+def join_stage(state, record):
+    options = state['options']
+    runs = [f'R{i}' for i in range(1, len(state['excel_files']) + 1)]
+    state['runs'] = runs
+    if 'trend' in state:
+        trend = state['trend']
+        state['matrix'] = trend.matrix(trend.run_range(options['trend_last']), labels=runs)
+    elif options['metric_columns']:
+        # The first metric is the primary one, which the filter, graphs and matrix outputs use
+        cube = build_cube(state['report_dfs'], runs, options['metric_columns'], missing=options['missing'],
+                          duplicates=options['duplicates'], dtype=options['dtype'])
+        state['cube'] = cube
+        state['matrix'] = cube.matrix(cube.metrics[0])
+    else:
+        state['matrix'] = build_matrix(state['report_dfs'], runs, missing=options['missing'],
+                                       duplicates=options['duplicates'], dtype=options['dtype'])
+    state['merged_df'] = state['matrix'].to_frame()
+    record['rows'] = len(state['merged_df'])
+    record['cells'] = len(state['merged_df']) * len(runs) * (len(state['cube'].metrics) if 'cube' in state else 1)
+
+
+def variance_stage(state, record):
+    plan = state['options']['comparison']
+    if 'cube' in state:
+        cube = state['cube']
+        state['variance_columns'], variances = cube.variance(plan=plan)
+        state['tables'] = metric_tables(cube, state['variance_columns'], variances, state['options']['thresholds'])
+        state['merged_df'] = state['tables'][0]['merged_df']
+    else:
+        matrix = state['matrix']
+        state['variance_columns'], variances = matrix.variance(plan=plan)
+        state['merged_df'] = matrix.to_frame(state['variance_columns'], variances)
+    record['rows'] = len(state['merged_df'])
+    record['cells'] = len(state['merged_df']) * len(state['variance_columns']) * len(state.get('tables') or [None])
+
+
+def filter_stage(state, record):
+    # The bands are taken on the primary metric when there are several (the cube's first
+    # one, worked out the same way without a join); a report lacking it reports no rows.
+    # Otherwise each report's second column holds the latencies.
+    options = state['options']
+    column = None
+    if 'cube' in state:
+        column = state['cube'].metrics[0]
+    elif options['metric_columns']:
+        column = report_metric_columns(state['report_dfs'], options['metric_columns'])[0]
+    state['filtered'] = [filter_report(df if column is None or column in df.columns else df.assign(**{column: None}),
+                                       options['filter_bands'], column) for df in state['report_dfs']]
+    record['rows'] = sum(len(band_df) for band_dfs in state['filtered'] for band_df in band_dfs)
+    record['cells'] = sum(int(band_df.size) for band_dfs in state['filtered'] for band_df in band_dfs)
+
+
+def style_stage(state, record):
+    # Only sets up the styled rows; the nested 'style' record inside 'write' holds the styling work
+    # (one set of rows per metric table of a cube)
+    options = state['options']
+    tables = state.get('tables') or [{'merged_df': state['merged_df'], 'thresholds': options['thresholds']}]
+    for table in tables:
+        rows = styled_rows(table['merged_df'], state['runs'], state['variance_columns'], thresholds=table['thresholds'],
+                           threshold_mode=options['threshold_mode'], variance_mode=options['variance_mode'],
+                           sparklines=options['sparklines'])
+        table['rows'] = state['metrics'].timed_iter('style', rows)
+    state['rows'] = tables[0]['rows']
+
+
+def render_stage(state, record):
+    options = state['options']
+    columns = graph_columns(state['runs'], state['variance_columns'])
+    specs = [line_chart_spec(chart_title([column]), state['merged_df'][column]) for column in columns]
+    state['images'] = dict(zip(columns, render_charts(specs, workers=options['chart_workers'],
+                                                      cache_folder=options['chart_cache_folder'])))
+    record['rows'] = len(specs)
+    record['cells'] = len(specs) * len(state['merged_df'])
+
+
+def write_stage(state, record):
+    # Every artifact gets a nested 'save' record. The report goes last so that, with
+    # metrics_sheet, its Metrics sheet covers everything up to its own save.
+    options = state['options']
+    outputs = state['outputs']
+    metrics = state['metrics']
+
+    if 'filter' in outputs:
+        with metrics.stage('save', 'filter') as save:
+            file_names = [os.path.basename(file) for file in state['excel_files']]
+            save['rows'] = write_filter_csv(outputs['filter'], file_names, state['report_dfs'],
+                                            options['filter_bands'], filtered=state['filtered'])
+            save['bytes_written'] = file_size(outputs['filter'])
+
+    if 'graphs' in outputs:
+        with metrics.stage('save', 'graphs') as save:
+            os.makedirs(outputs['graphs'], exist_ok=True)
+            for column, png in state['images'].items():
+                with open(os.path.join(outputs['graphs'], f"{column}.png"), 'wb') as f:
+                    f.write(png)
+                save['bytes_written'] += len(png)
+            save['rows'] = len(state['images'])
+
+    if 'matrix' in outputs:
+        from .export import write_matrix
+
+        with metrics.stage('save', 'matrix') as save:
+            save['rows'] = write_matrix(outputs['matrix'], state['merged_df'], state['runs'],
+                                        state['variance_columns'], state['excel_files'], state.get('digests'))
+            save['cells'] = save['rows'] * (1 + len(state['runs']) + len(state['variance_columns']))
+            save['bytes_written'] = file_size(outputs['matrix'])
+
+    if 'report' in outputs:
+        with metrics.stage('save', 'report') as save:
+            runs, variance_columns = state['runs'], state['variance_columns']
+            charts = options['charts']
+            chart_columns = graph_columns(runs, variance_columns) if charts and runs else ()
+            images = [state['images'][column] for column in chart_columns] if charts == 'image' else None
+            summary = metrics.summary_rows() if options['metrics_sheet'] else None
+            files = write_consolidated(outputs['report'], state['merged_df'], runs, variance_columns,
+                                       backend=options['backend'], thresholds=options['thresholds'],
+                                       threshold_mode=options['threshold_mode'],
+                                       variance_mode=options['variance_mode'], chart_columns=chart_columns,
+                                       chart_mode=charts or 'native', chart_layout=options['chart_layout'],
+                                       sparklines=options['sparklines'], rows=state['rows'], images=images,
+                                       summary=summary, max_rows=options['max_rows'],
+                                       max_columns=options['max_columns'],
+                                       shards_per_workbook=options['shards_per_workbook'],
+                                       tables=state.get('tables'))
+            save['rows'] = len(state['merged_df']) * len(state.get('tables') or [None])
+            save['cells'] = save['rows'] * (1 + len(runs) + len(variance_columns))
+            save['bytes_written'] = sum(file_size(file) for file in files)
+
+    for save in metrics.records:
+        if save['stage'] == 'save':
+            record['bytes_written'] += save['bytes_written']
+
+
+STAGE_FUNCTIONS = {
+    'ingest': ingest_stage,
+    'join': join_stage,
+    'variance': variance_stage,
+    'filter': filter_stage,
+    'style': style_stage,
+    'render': render_stage,
+    'write': write_stage,
+}
+
+
+def pipeline_state(excel_files, outputs, workers=1, cache_folder=DEFAULT_CACHE_FOLDER, missing='end', duplicates='first',
+                   dtype='float64', comparison=DEFAULT_PLAN, thresholds=THRESHOLDS, threshold_mode='cells',
+                   variance_mode='text', backend='openpyxl', charts=None, chart_layout='combined', sparklines=False,
+                   chart_workers=1, chart_cache_folder=DEFAULT_CHART_CACHE, filter_bands=None, metrics_file=None,
+                   metrics_sheet=False, max_rows=EXCEL_MAX_ROWS, max_columns=EXCEL_MAX_COLUMNS,
+                   shards_per_workbook=None, metric_columns=None, history_file=None, history_tag=None,
+                   history_last=None, history_baseline=None, trend_file=None, trend_last=None, report_cache=None):
+    # Initial state for a pipeline run over excel_files producing outputs (artifact -> output path).
+    # charts adds a Graphs sheet to the report: None, 'native' or 'image' (see excelcomp.charts).
+    # dtype is the float type of the run and variance matrix; 'float32' halves its memory.
+    # filter_bands are the band edges of the filter CSV, the thresholds by default.
+    # metrics_file receives the per-stage metrics as JSON (.ndjson appends a line per run);
+    # metrics_sheet adds them to the report as a Metrics sheet (see excelcomp.metrics).
+    # A report larger than max_rows x max_columns is split over shard sheets and, with
+    # shards_per_workbook, over several workbooks (see excelcomp.shards).
+    # metric_columns (a list of report columns, or 'all' for every numeric one) carries
+    # several metrics per run, written as one report sheet each; the first one is used
+    # for the filter CSV, graphs and matrix.
+    # history_file appends every ingested report to a HistoryStore (the last one tagged
+    # history_tag); with history_last and/or history_baseline the stored last N runs,
+    # after the latest one tagged history_baseline, are consolidated instead of excel_files.
+    # trend_file appends every ingested report to a memory-mapped TrendMatrix; with
+    # trend_last its last N runs are consolidated, sliced from the mapping (latencies in
+    # float32, transactions in the order they first entered the matrix).
+    # report_cache, any object with ReportCache's load/store/save (such as the
+    # MemoryReportCache of a watch loop), is used instead of a cache in cache_folder.
+    selected = history_file and (history_last or history_baseline)
+    if trend_last and (selected or metric_columns or 'filter' in outputs):
+        raise ValueError("trend_last consolidates one latency per run; it cannot be combined with history runs, "
+                         "metric_columns or the filter CSV")
+    selected = selected or (trend_file and trend_last)
+    if 'report' in outputs and not selected:
+        # Reject shard limits the runs cannot fit in before any report is read
+        runs = [f'R{i}' for i in range(1, len(excel_files) + 1)]
+        plan_shards(outputs['report'], 'Sheet1', 0, sheet_header(runs, (), sparklines), runs, sparklines, max_rows,
+                    max_columns, shards_per_workbook)
+    return {
+        'excel_files': list(excel_files),
+        'outputs': dict(outputs),
+        'options': {
+            'workers': workers, 'cache_folder': cache_folder, 'missing': missing, 'duplicates': duplicates,
+            'dtype': dtype, 'comparison': comparison, 'thresholds': thresholds, 'threshold_mode': threshold_mode,
+            'variance_mode': variance_mode, 'backend': backend, 'charts': charts, 'chart_layout': chart_layout,
+            'sparklines': sparklines, 'chart_workers': chart_workers, 'chart_cache_folder': chart_cache_folder,
+            'filter_bands': tuple(filter_bands) if filter_bands else thresholds,
+            'metrics_file': metrics_file, 'metrics_sheet': metrics_sheet,
+            'max_rows': max_rows, 'max_columns': max_columns, 'shards_per_workbook': shards_per_workbook,
+            'metric_columns': metric_columns, 'history_file': history_file, 'history_tag': history_tag,
+            'history_last': history_last, 'history_baseline': history_baseline, 'trend_file': trend_file,
+            'trend_last': trend_last, 'report_cache': report_cache,
+        },
+        'metrics': Metrics(),
+        'timings': {},
+    }
+
+
+def run_stage(state, stage):
+    # Run one stage on the state under its metrics record
+    with state['metrics'].stage(stage) as record:
+        STAGE_FUNCTIONS[stage](state, record)
+    state['timings'][stage] = record['seconds']
+    return record
+
+
+def run_pipeline(excel_files, outputs, **options):
+    # Produce every artifact in outputs from one ingest of excel_files (options as for pipeline_state).
+    # Returns the pipeline state: the wall time of each stage is under 'timings' and the
+    # full per-stage records under 'metrics'. Styling happens while the report is written,
+    # so its time is counted under 'write' (and broken out in the nested 'style' record).
+    state = pipeline_state(excel_files, outputs, **options)
+    for stage in pipeline_stages(state['outputs'], state['options']['charts']):
+        run_stage(state, stage)
+    if state['options']['metrics_file']:
+        summary = state['metrics'].summary()
+        summary.update(reports=len(state['excel_files']), outputs=state['outputs'])
+        write_metrics(state['options']['metrics_file'], summary)
+    return state
@@ -0,0 +1,98 @@
+import os
+
+# Sheet sharding of the consolidated table.
+# A sheet holds at most EXCEL_MAX_ROWS rows and EXCEL_MAX_COLUMNS columns, so a larger
+# table is planned up front, before anything is written, as a grid of shard sheets:
+#   row shards    - consecutive blocks of transactions, each under its own header row
+#   column shards - consecutive blocks of run and variance columns, each repeating the
+#                   Transactions column; the runs (and the Trend column) stay on the first
+# Row shards can be spread over several workbooks (report.xlsx, report_2.xlsx, ...),
+# keeping all column shards of a row shard together. The first workbook then starts
+# with an index sheet listing where every shard went.
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_COLUMNS = 16384
+
+# Longest sheet name Excel accepts
+SHEET_NAME_LENGTH = 31
+
+INDEX_HEADER = ['Sheet', 'Workbook', 'First row', 'Last row', 'First transaction', 'Last transaction',
+                'First column', 'Last column']
+
+
+def row_shards(rows, max_rows=EXCEL_MAX_ROWS):
+    # [start, stop) data-row ranges of the row shards; every sheet also has its header row
+    if max_rows < 2:
+        raise ValueError(f"A sheet needs room for the header and at least one row, got max_rows={max_rows}")
+    return [(start, min(start + max_rows - 1, rows)) for start in range(0, rows, max_rows - 1)] or [(0, 0)]
+
+
+def column_shards(header, runs, sparklines=False, max_columns=EXCEL_MAX_COLUMNS):
+    # Header positions held by each column shard, Transactions (0) first. The first shard
+    # keeps all runs and, with sparklines, the Trend column (last in header), so the
+    # sparklines and threshold rules only ever look at one sheet.
+    trend = [len(header) - 1] if sparklines else []
+    body = list(range(1, len(header) - len(trend)))
+    first = max_columns - 1 - len(trend)
+    if len(runs) > first:
+        raise ValueError(f"{len(runs)} runs do not fit on one sheet of {max_columns} columns")
+
+    shards = [[0] + body[:first] + trend]
+    rest = body[first:]
+    for start in range(0, len(rest), max_columns - 1):
+        shards.append([0] + rest[start:start + max_columns - 1])
+    return shards
+
+
+def shard_sheet_name(sheet_name, row_shard, column_shard, row_count, column_count):
+    # sheet_name itself when there is a single shard, else "Sheet1 2" (row shards only) or "Sheet1 2.3"
+    if row_count == 1 and column_count == 1:
+        return sheet_name
+    suffix = f" {row_shard + 1}" if column_count == 1 else f" {row_shard + 1}.{column_shard + 1}"
+    return sheet_name[:SHEET_NAME_LENGTH - len(suffix)] + suffix
+
+
+def shard_workbook(output_file, workbook):
+    # File of the nth workbook: output_file, then report_2.xlsx, report_3.xlsx, ...
+    if workbook == 0:
+        return output_file
+    base, extension = os.path.splitext(output_file)
+    return f"{base}_{workbook + 1}{extension}"
+
+
+def plan_shards(output_file, sheet_name, rows, header, runs, sparklines=False, max_rows=EXCEL_MAX_ROWS,
+                max_columns=EXCEL_MAX_COLUMNS, shards_per_workbook=None):
+    # One dict per shard sheet, row shard by row shard: its sheet name, workbook file,
+    # [start, stop) data rows and the header positions of its columns
+    if shards_per_workbook is not None and shards_per_workbook < 1:
+        raise ValueError(f"shards_per_workbook must be at least 1, got {shards_per_workbook}")
+    row_bounds = row_shards(rows, max_rows)
+    column_groups = column_shards(header, runs, sparklines, max_columns)
+
+    shards = []
+    for r, bounds in enumerate(row_bounds):
+        workbook = shard_workbook(output_file, r // shards_per_workbook if shards_per_workbook else 0)
+        for c, columns in enumerate(column_groups):
+            shards.append({
+                'sheet': shard_sheet_name(sheet_name, r, c, len(row_bounds), len(column_groups)),
+                'workbook': workbook,
+                'row_shard': r,
+                'rows': bounds,
+                'columns': columns,
+            })
+    return shards
+
+
+def shard_index(shards, header, names):
+    # Rows of the index sheet: where each shard went, which 1-based table rows and which
+    # transactions (from the names Series) it holds, and its first and last column after Transactions
+    rows = [INDEX_HEADER]
+    for shard in shards:
+        start, stop = shard['rows']
+        columns = shard['columns']
+        rows.append([
+            shard['sheet'], os.path.basename(shard['workbook']),
+            start + 1 if stop > start else None, stop if stop > start else None,
+            names.iloc[start] if stop > start else None, names.iloc[stop - 1] if stop > start else None,
+            header[columns[1]] if len(columns) > 1 else None, header[columns[-1]] if len(columns) > 1 else None,
+        ])
+    return rows
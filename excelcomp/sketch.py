@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+
+# Mergeable latency quantile sketch, one per run, covering every transaction in it.
+# Latencies go into logarithmic buckets (the DDSketch scheme): bucket k holds the values
+# in (gamma^(k-1), gamma^k] with gamma = (1 + accuracy) / (1 - accuracy), so any
+# quantile read back is within `accuracy` of a value at that rank, relative to it.
+# Only (transaction, bucket) -> count pairs are kept, sorted by transaction then bucket.
+# Memory therefore grows with the number of distinct latency buckets per transaction
+# (a few hundred at most), never with the number of samples. Two sketches merge by
+# adding counts, so sketches of log chunks, files or generator hosts combine exactly.
+SKETCH_ACCURACY = 0.01
+
+# Values below MIN_VALUE seconds (zero included) share bucket 0; the others get buckets
+# 1..BUCKETS-1, the last one absorbing anything beyond its upper edge
+MIN_VALUE = 1e-6
+BUCKETS = 1 << 16
+
+
+class QuantileSketch:
+    # names: transaction name -> ID in first-seen order; keys: ID * BUCKETS + bucket; counts: samples per key
+
+    def __init__(self, accuracy=SKETCH_ACCURACY):
+        if not 0 < accuracy < 1:
+            raise ValueError(f"Sketch accuracy must be between 0 and 1, got {accuracy}")
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self._min_index = int(np.floor(np.log(MIN_VALUE) / self._log_gamma))
+        self.names = {}
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.counts.nbytes
+
+    def bucket(self, values):
+        # Bucket of every value in seconds
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index = np.ceil(np.log(values) / self._log_gamma)
+        buckets = np.clip(np.nan_to_num(index - self._min_index + 1, nan=0, neginf=0), 0, BUCKETS - 1)
+        buckets[~(values >= MIN_VALUE)] = 0
+        return buckets.astype(np.int64)
+
+    def bucket_value(self, buckets):
+        # Estimate of the values in each bucket: the point with the same relative error to both edges
+        index = buckets + self._min_index - 1
+        return np.where(buckets > 0, 2 * self.gamma ** index / (self.gamma + 1), 0.0)
+
+    def intern(self, names):
+        # IDs of an array of transaction names, new names being added in the order they appear
+        codes, uniques = pd.factorize(names)
+        ids = np.array([self.names.setdefault(name, len(self.names)) for name in uniques], dtype=np.int64)
+        return ids[codes]
+
+    def add(self, names, values):
+        # Count one sample per (name, latency in seconds); rows without a name or a latency are skipped
+        names = pd.Series(names)
+        values = np.asarray(values, dtype=np.float64)
+        keep = names.notna().to_numpy() & np.isfinite(values)
+        if not keep.all():
+            names, values = names[keep], values[keep]
+        if len(values):
+            self._add_keys(self.intern(names) * BUCKETS + self.bucket(values), None)
+
+    def _add_keys(self, keys, counts):
+        # Fold (key, count) pairs into the sorted state; counts=None means one sample per key
+        if counts is None:
+            keys, counts = np.unique(keys, return_counts=True)
+        keys = np.concatenate([self.keys, keys])
+        counts = np.concatenate([self.counts, counts])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts).astype(np.int64)
+
+    def merge(self, other):
+        # Add every count of another sketch (same accuracy); its new transactions go after ours
+        if other.accuracy != self.accuracy:
+            raise ValueError(f"Cannot merge sketches of accuracy {other.accuracy} and {self.accuracy}")
+        ids = self.intern(pd.Series(list(other.names), dtype=object))
+        self._add_keys(ids[other.keys // BUCKETS] * BUCKETS + other.keys % BUCKETS, other.counts)
+        return self
+
+    def sample_counts(self):
+        # Samples per transaction ID
+        return np.bincount(self.keys // BUCKETS, weights=self.counts, minlength=len(self.names)).astype(np.int64)
+
+    def quantile(self, q):
+        # Latency at quantile q (0..1) of every transaction, by ID; NaN for one without samples.
+        # Like DDSketch, the value is that of the sample at rank floor(q * (count - 1)).
+        if not 0 <= q <= 1:
+            raise ValueError(f"Quantile must be between 0 and 1, got {q}")
+        if not len(self.keys):
+            return np.full(len(self.names), np.nan)
+        ids = self.keys // BUCKETS
+        totals = self.sample_counts()
+        cumulative = np.cumsum(self.counts)
+        # Samples of all earlier transactions, then the wanted rank within this one
+        before = np.concatenate([[0], cumulative])[np.searchsorted(ids, np.arange(len(self.names)))]
+        rank = before + np.floor(q * np.maximum(totals - 1, 0))
+        position = np.minimum(np.searchsorted(cumulative, rank, side='right'), len(self.keys) - 1)
+        values = self.bucket_value(self.keys[position] % BUCKETS)
+        values[totals == 0] = np.nan
+        return values
@@ -0,0 +1,106 @@
+import io
+
+import numpy as np
+
+# Per-transaction trend sparklines.
+# Each transaction row gets a small line of its R1..Rn latencies in a "Trend" column,
+# so runs where one transaction regressed stand out row by row, instead of plotting
+# the whole population as one point per transaction in a few large charts.
+#   xlsxwriter - a single Excel sparkline group over all rows (drawn by Excel itself)
+#   openpyxl   - openpyxl cannot write sparklines, so each row gets a tiny bitmap;
+#                rows with the same history share one rendered PNG
+# Either way the cost is one pass over the rows x runs matrix.
+SPARKLINE_COLUMN = 'Trend'
+
+# Bitmap size in pixels (fits a default-width cell) and line colours by overall trend:
+# red when the last run is slower than the first, green when faster, black otherwise
+SPARKLINE_SIZE = (60, 16)
+SPARKLINE_COLORS = {'up': "FF0000", 'down': "00b300", 'flat': "000000"}
+
+
+def sparkline_trend(values):
+    # 'up', 'down' or 'flat' from the first to the last measured run
+    finite = values[np.isfinite(values)]
+    if len(finite) < 2 or finite[-1] == finite[0]:
+        return 'flat'
+    return 'up' if finite[-1] > finite[0] else 'down'
+
+
+def sparkline_png(values, size=SPARKLINE_SIZE):
+    # PNG bytes of one sparkline; missing runs break the line. Drawn with Pillow,
+    # which openpyxl needs for images anyway and is far cheaper than a matplotlib figure per row.
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    image = Image.new('RGB', size, 'white')
+    finite = np.isfinite(values)
+    if finite.any():
+        low, high = values[finite].min(), values[finite].max()
+        span = (high - low) or 1.0
+        xs = np.linspace(1, width - 2, len(values)) if len(values) > 1 else np.array([width / 2])
+        ys = (height - 2) - (values - low) / span * (height - 3)
+        color = f"#{SPARKLINE_COLORS[sparkline_trend(values)]}"
+        draw = ImageDraw.Draw(image)
+        segment = []
+        for x, y, ok in zip(xs.tolist(), ys.tolist(), finite.tolist()):
+            if ok:
+                segment.append((x, y))
+                continue
+            if len(segment) > 1:
+                draw.line(segment, fill=color, width=1)
+            segment = []
+        if len(segment) > 1:
+            draw.line(segment, fill=color, width=1)
+        # Mark the latest measured run
+        last = np.flatnonzero(finite)[-1]
+        draw.point((float(xs[last]), float(ys[last])), fill=color)
+
+    buf = io.BytesIO()
+    image.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def render_sparklines(values, size=SPARKLINE_SIZE):
+    # One PNG per row of a rows x runs matrix; identical histories are rendered once
+    rendered = {}
+    images = []
+    for row in np.asarray(values, dtype=float):
+        key = row.tobytes()
+        if key not in rendered:
+            rendered[key] = sparkline_png(row, size)
+        images.append(rendered[key])
+    return images
+
+
+def add_openpyxl_sparklines(ws, values, column, first_row=2, size=SPARKLINE_SIZE):
+    # Anchor a sparkline bitmap per row in `column` (1-based) from first_row down
+    # (openpyxl sheet, normal or write-only)
+    from openpyxl.drawing.image import Image
+    from openpyxl.utils import get_column_letter
+
+    letter = get_column_letter(column)
+    for row, png in enumerate(render_sparklines(values, size), start=first_row):
+        img = Image(io.BytesIO(png))
+        img.anchor = f"{letter}{row}"
+        ws.add_image(img)
+
+
+def add_xlsxwriter_sparklines(ws, rows, first_col, last_col, column, first_row=1):
+    # One sparkline group: row r of `column` plots columns first_col..last_col of row r
+    # (0-based rows and columns, `rows` data rows from first_row down)
+    from xlsxwriter.utility import xl_rowcol_to_cell
+
+    if not rows:
+        return
+    locations = [xl_rowcol_to_cell(r, column) for r in range(first_row, first_row + rows)]
+    ranges = [f"{xl_rowcol_to_cell(r, first_col)}:{xl_rowcol_to_cell(r, last_col)}"
+              for r in range(first_row, first_row + rows)]
+    ws.add_sparkline(first_row, column, {
+        'location': locations,
+        'range': ranges,
+        'markers': False,
+        'last_point': True,
+        'high_point': True,
+        'series_color': "#0000FF",
+        'empty_cells': 'gaps',
+    })
@@ -0,0 +1,219 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Shared style registry for the consolidated sheet.
+# Every cell gets one of a handful of named styles, decided once per cell from the
+# numeric matrix, instead of allocating Font/Border objects per cell and restyling
+# the sheet in several passes. The names are registered once per workbook as openpyxl
+# NamedStyles (or xlsxwriter formats), so the style table stays this small however
+# large the sheet gets.
+#   header - light blue fill
+#   text   - plain cell (transaction names, blanks)
+#   red / orange / green - latency thresholds (>= 2, 1.8 to <2, below 1.8 by default)
+#   up / down / flat     - variance arrows (red, green, black)
+#   change - numeric variance cell; VARIANCE_FORMAT supplies the arrow and colour
+# All of them are bordered; all but header and text use a bold font.
+STYLES = {
+    'header': {'fill': "ADD8E6"},
+    'text': {},
+    'red': {'font_color': "FF0000"},
+    'orange': {'font_color': "FFA500"},
+    'green': {'font_color': "00b300"},
+    'up': {'font_color': "FF0000"},
+    'down': {'font_color': "00b300"},
+    'flat': {'font_color': "000000"},
+    'change': {'font_color': "000000", 'number_format': None},  # number_format filled in below
+}
+
+# Latency thresholds in seconds: orange from the first one, red from the second
+THRESHOLDS = (1.8, 2.0)
+
+# A metric column is a latency, and gets the threshold colours, when its lowercased name
+# starts with a percentile (p50, p95, p99.9) or contains one of these words; throughput,
+# error rates and counts are written plain
+LATENCY_METRIC_WORDS = ('time', 'latency', 'elapsed', 'response', 'median', 'average', 'avg')
+
+# How threshold colours get into the sheet:
+#   'cells' - each latency cell is given its red/orange/green style
+#   'rules' - three range-level conditional-formatting rules over the run columns,
+#             so the cost no longer grows with the number of rows
+THRESHOLD_MODES = ('cells', 'rules')
+
+# Arrow marks appended to variance values, by style
+ARROWS = {'up': "% ↑", 'down': "% ↓", 'flat': "% →"}
+
+# How variance cells are written:
+#   'text'   - "12.34 % ↑" strings with a red/green/black font per cell
+#   'number' - the raw float, shown through one custom number format whose
+#              positive/negative/zero sections add the arrow and the colour,
+#              so the column stays sortable and numeric on re-read
+VARIANCE_MODES = ('text', 'number')
+VARIANCE_FORMAT = '[Red]0.00" % ↑";[Color10]-0.00" % ↓";0.00" % →"'
+STYLES['change']['number_format'] = VARIANCE_FORMAT
+
+# Prefix of the registered NamedStyle names, so they do not clash with Excel's built-ins
+STYLE_PREFIX = "excelcomp "
+
+
+def style_name(key):
+    return STYLE_PREFIX + key
+
+
+def register_openpyxl_styles(wb):
+    # Add the named styles to an openpyxl workbook (once) and return key -> style name
+    from openpyxl.styles import Border, Font, NamedStyle, PatternFill, Side
+
+    thin = Side(style="thin")
+    existing = set(wb.named_styles)
+    names = {}
+    for key, spec in STYLES.items():
+        name = style_name(key)
+        if name not in existing:
+            named = NamedStyle(name=name)
+            named.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+            if 'font_color' in spec:
+                named.font = Font(color=spec['font_color'], bold=True)
+            if 'fill' in spec:
+                named.fill = PatternFill(start_color=spec['fill'], end_color=spec['fill'], fill_type="solid")
+            if 'number_format' in spec:
+                named.number_format = spec['number_format']
+            wb.add_named_style(named)
+        names[key] = name
+    return names
+
+
+def xlsxwriter_formats(wb):
+    # The same styles as xlsxwriter formats, key -> Format
+    formats = {}
+    for key, spec in STYLES.items():
+        properties = {'border': 1}
+        if 'font_color' in spec:
+            properties.update(bold=True, font_color=f"#{spec['font_color']}")
+        if 'fill' in spec:
+            properties.update(bg_color=f"#{spec['fill']}", pattern=1)
+        if 'number_format' in spec:
+            properties.update(num_format=spec['number_format'])
+        formats[key] = wb.add_format(properties)
+    return formats
+
+
+def metric_thresholds(metric, thresholds=THRESHOLDS):
+    # thresholds for a latency metric column, None (no colours) for any other
+    name = str(metric).strip().lower()
+    if re.match(r'p\d', name) or any(word in name for word in LATENCY_METRIC_WORDS):
+        return thresholds
+    return None
+
+
+def numeric(values):
+    # A column as float64 (float32 columns stay float32), anything non-numeric as NaN
+    values = pd.to_numeric(values, errors='coerce')
+    return values.to_numpy(dtype=np.float32 if values.dtype == np.float32 else float)
+
+
+def run_styles(values, thresholds=THRESHOLDS):
+    # Threshold style per latency value, 'text' where the value is missing (or for every
+    # value with thresholds=None)
+    if thresholds is None:
+        return np.full(len(values), 'text')
+    low, high = thresholds
+    return np.select([values >= high, values >= low, ~np.isnan(values)], ['red', 'orange', 'green'], 'text')
+
+
+def variance_styles(values):
+    # Arrow style per percentage delta, 'text' where the value is missing
+    return np.select([values > 0, values < 0, values == 0], ['up', 'down', 'flat'], 'text')
+
+
+def variance_texts(values, styles):
+    # "12.34 % ↑" strings for the variance cells, None where the value is missing
+    return [None if style == 'text' else f"{value:.2f} {ARROWS[style]}" for value, style in zip(values, styles)]
+
+
+def cell_values(values):
+    # Python floats for writing, None for missing values.
+    # float32 goes through its shortest decimal form, so 2.12 is written as 2.12, not 2.119999885559082.
+    if values.dtype == np.float32:
+        values = values.astype(str).astype(float)
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+def variance_cells(values, variance_mode='text'):
+    # (cell values, style keys) for a column of percentage deltas
+    if variance_mode == 'number':
+        return cell_values(values), np.where(np.isnan(values), 'text', 'change').tolist()
+    styles = variance_styles(values)
+    return variance_texts(values, styles), styles.tolist()
+
+
+def threshold_colors():
+    # Font colour per threshold style, as used by the rules
+    return {key: STYLES[key]['font_color'] for key in ('red', 'orange', 'green')}
+
+
+def run_range(runs, first_row, last_row):
+    # "B2:F101"-style range covering the run columns, which follow the Transactions column
+    from openpyxl.utils import get_column_letter
+
+    return f"B{first_row}:{get_column_letter(1 + len(runs))}{last_row}"
+
+
+def add_threshold_rules(ws, cell_range, thresholds=THRESHOLDS, colors=None, bold=True):
+    # Colour a range of latency cells with three conditional-formatting rules
+    # (openpyxl sheet, normal or write-only). Rules are added in priority order and
+    # stop at the first match: red >= high, orange >= low, green below low.
+    from openpyxl.formatting.rule import CellIsRule
+    from openpyxl.styles import Font
+
+    colors = colors or threshold_colors()
+    low, high = thresholds
+    for key, operator, value in (('red', 'greaterThanOrEqual', high),
+                                 ('orange', 'greaterThanOrEqual', low),
+                                 ('green', 'lessThan', low)):
+        font = Font(color=colors[key], bold=bold)
+        ws.conditional_formatting.add(cell_range, CellIsRule(operator=operator, formula=[repr(value)], font=font, stopIfTrue=True))
+
+
+def add_xlsxwriter_threshold_rules(wb, ws, first_row, first_col, last_row, last_col, thresholds=THRESHOLDS):
+    # The same three rules for an xlsxwriter sheet (0-based, inclusive cell bounds)
+    low, high = thresholds
+    for key, criteria, value in (('red', '>=', high), ('orange', '>=', low), ('green', '<', low)):
+        fmt = wb.add_format({'bold': True, 'font_color': f"#{STYLES[key]['font_color']}"})
+        ws.conditional_format(first_row, first_col, last_row, last_col,
+                              {'type': 'cell', 'criteria': criteria, 'value': value, 'format': fmt, 'stop_if_true': True})
+
+
+def column_cells(df, runs, variance_columns, thresholds=THRESHOLDS, threshold_mode='cells', variance_mode='text'):
+    # (values, style keys) for every column of the sheet body, in sheet order.
+    # In 'rules' mode the latency cells stay plain and the rules colour them.
+    columns = [(df['Transactions'].tolist(), ['text'] * len(df))]
+    for run in runs:
+        values = numeric(df[run])
+        styles = run_styles(values, thresholds).tolist() if threshold_mode == 'cells' else ['text'] * len(df)
+        columns.append((cell_values(values), styles))
+    for variance_column in variance_columns:
+        columns.append(variance_cells(numeric(df[variance_column]), variance_mode))
+    return columns
+
+
+def style_sheet(ws, merged_df, runs, variance_columns, header='header', min_row=1,
+                thresholds=THRESHOLDS, threshold_mode='cells', variance_mode='text'):
+    # Style a sheet already holding merged_df (header on min_row) in a single pass:
+    # every cell gets its named style once and variance cells get their arrow text
+    # (or, with variance_mode='number', keep their float under the arrow number format).
+    names = register_openpyxl_styles(ws.parent)
+    columns = column_cells(merged_df, runs, variance_columns, thresholds, threshold_mode, variance_mode)
+    width = len(columns)
+
+    for cell in next(ws.iter_rows(min_row=min_row, max_row=min_row, max_col=width)):
+        cell.style = names[header]
+
+    for i, row in enumerate(ws.iter_rows(min_row=min_row + 1, max_row=min_row + len(merged_df), max_col=width)):
+        for cell, (values, styles) in zip(row, columns):
+            cell.value = values[i]
+            cell.style = names[styles[i]]
+
+    if threshold_mode == 'rules' and thresholds is not None and runs and len(merged_df):
+        add_threshold_rules(ws, run_range(runs, min_row + 1, min_row + len(merged_df)), thresholds)
@@ -0,0 +1,169 @@
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .model import DUPLICATE_POLICIES, ReportMatrix, collapse_duplicates, report_values
+
+# Append-only, memory-mapped latency matrix for long run histories.
+# Three files share a base path:
+#   <path>.f32   - float32 latencies, one run after another, each run `capacity` values
+#                  long (row i is transaction i, NaN where the run lacks it)
+#   <path>.valid - validity bitmap, one run after another, capacity / 8 bytes each
+#                  (bit i set when transaction i has a numeric value in the run)
+#   <path>.json  - sidecar index: capacity, transaction names in ID order, run metadata
+# Appending a run writes one block to each data file and then replaces the sidecar,
+# which alone says how many runs are valid; a run half-written by a crash is ignored
+# and overwritten by the next append. New transactions get the next free rows, and
+# when they outgrow the capacity the files are rewritten once at twice the size.
+# Readers map the files rather than loading them: a run range and a contiguous block
+# of transactions are views of the mapping (no copy), a transaction list is one gather.
+TREND_DTYPE = np.dtype('<f4')
+MIN_CAPACITY = 1024  # Transactions per run block of a new matrix; always a multiple of 8
+
+TREND_EXTENSIONS = ('.f32', '.valid', '.json')
+
+
+def trend_files(path):
+    # (values, validity, index) files of a trend matrix
+    return tuple(path + extension for extension in TREND_EXTENSIONS)
+
+
+def write_json(file, data):
+    # Write through a temporary file so readers only ever see a complete index
+    with open(file + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(file + '.tmp', file)
+
+
+class TrendMatrix:
+    # names: transaction name by row; runs: one dict (name, file, digest, added) per run, oldest first
+
+    def __init__(self, path):
+        self.path = path
+        self.values_file, self.valid_file, self.index_file = trend_files(path)
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            index = {'capacity': MIN_CAPACITY, 'transactions': [], 'runs': []}
+        self.capacity = index['capacity']
+        self.names = index['transactions']
+        self.runs = index['runs']
+        self._ids = None  # Transaction name -> row, built on first use
+        self._map()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _row_ids(self):
+        if self._ids is None:
+            self._ids = {transaction: i for i, transaction in enumerate(self.names)}
+        return self._ids
+
+    def _map(self):
+        # (Re)map the valid runs of both data files read-only
+        shape = (len(self.runs), self.capacity)
+        if self.runs:
+            self._values = np.memmap(self.values_file, dtype=TREND_DTYPE, mode='r', shape=shape)
+            self._valid = np.memmap(self.valid_file, dtype=np.uint8, mode='r', shape=(shape[0], shape[1] // 8))
+        else:
+            self._values = np.empty(shape, dtype=TREND_DTYPE)
+            self._valid = np.empty((0, shape[1] // 8), dtype=np.uint8)
+        self._name_array = np.array(self.names, dtype=object)
+
+    def _save_index(self):
+        write_json(self.index_file, {'capacity': self.capacity, 'transactions': self.names, 'runs': self.runs})
+
+    def _grow(self, needed):
+        # Rewrite both data files with room for `needed` transactions per run
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for file, old, width, fill in ((self.values_file, self._values, capacity, np.nan),
+                                       (self.valid_file, self._valid, capacity // 8, 0)):
+            with open(file + '.tmp', 'wb') as f:
+                block = np.full(width, fill, dtype=old.dtype)
+                for run in old:
+                    block[:len(run)] = run
+                    f.write(block.tobytes())
+            os.replace(file + '.tmp', file)
+        self.capacity = capacity
+        self._save_index()
+        self._map()
+
+    def _write_run(self, file, block):
+        # Put a run block right after the valid ones, dropping anything a crash left behind
+        offset = len(self.runs) * block.nbytes
+        with open(file, 'r+b' if os.path.exists(file) else 'wb') as f:
+            f.seek(offset)
+            f.write(block.tobytes())
+            f.truncate()
+
+    def append(self, df, name=None, file=None, digest=None, duplicates='first'):
+        # Append a report's second column as the next run and return its position.
+        # A report whose digest is already stored is not appended again.
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"Unknown duplicates policy {duplicates!r}, expected one of {DUPLICATE_POLICIES}")
+        if digest is not None:
+            for position, run in enumerate(self.runs):
+                if run['digest'] == digest:
+                    return position
+        known = self._row_ids()
+        names, values = report_values(df)
+        codes, uniques = pd.factorize(names, use_na_sentinel=False)
+        rows = np.empty(len(uniques), dtype=np.int64)
+        for i, transaction in enumerate(uniques):
+            transaction = None if pd.isna(transaction) else str(transaction)
+            if transaction not in known:
+                known[transaction] = len(self.names)
+                self.names.append(transaction)
+            rows[i] = known[transaction]
+        ids, values = collapse_duplicates(rows[codes], values, duplicates, pd.Index(self.names, dtype=object))
+        if len(self.names) > self.capacity:
+            self._grow(len(self.names))
+
+        block = np.full(self.capacity, np.nan, dtype=TREND_DTYPE)
+        block[ids] = values[:, 0]
+        valid = np.zeros(self.capacity, dtype=bool)
+        valid[ids] = ~np.isnan(values[:, 0])
+        self._write_run(self.values_file, block)
+        self._write_run(self.valid_file, np.packbits(valid, bitorder='little'))
+
+        added = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+        self.runs.append({'name': name or f'R{len(self.runs) + 1}', 'file': os.path.basename(file) if file else None,
+                          'digest': digest, 'added': added})
+        self._save_index()
+        self._map()
+        return len(self.runs) - 1
+
+    def run_range(self, last=None):
+        # Slice of the last `last` runs (all of them by default)
+        return slice(-last, None) if last else slice(None)
+
+    def values(self, runs=slice(None), rows=slice(None)):
+        # transactions x runs float32 latencies; slices are views of the mapping
+        return self._values[runs, :len(self.names)][:, rows].T
+
+    def valid(self, runs=slice(None), rows=slice(None)):
+        # transactions x runs bool mask of the numeric values, unpacked from the bitmap
+        bits = np.unpackbits(self._valid[runs], axis=1, count=len(self.names), bitorder='little')
+        return bits[:, rows].T.view(bool)
+
+    def trend(self, name, runs=slice(None)):
+        # One transaction's latency in each run (a strided view of the mapping)
+        return self._values[runs, self._row_ids()[name]]
+
+    def matrix(self, runs=slice(None), rows=None, labels=None):
+        # ReportMatrix of a run range (a slice or run positions) and transaction rows.
+        # rows=None keeps the transactions with a value in any of the runs, in row order;
+        # labels rename the runs (their stored names by default).
+        valid = self.valid(runs)
+        if rows is None:
+            present = valid.any(axis=1)
+            rows = slice(None) if present.all() else np.flatnonzero(present)
+        selected = self.runs[runs] if isinstance(runs, slice) else [self.runs[i] for i in runs]
+        return ReportMatrix(pd.Index(self._name_array[rows]), self.values(runs, rows), ~valid[rows],
+                            labels or [run['name'] for run in selected])
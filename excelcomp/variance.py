@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+# Comparison plans. Each yields (new, old) run pairs, compared as ((new - old) / new) * 100.
+#   'baseline'    - the baseline run (latest by default) against every other run
+#   'consecutive' - every run against the one before it, newest first
+#   'all-pairs'   - every run against every earlier run
+PLANS = ('baseline', 'consecutive', 'all-pairs')
+
+# The plan the consolidation scripts have always used: R5 Vs R1..R4, then R4 Vs R3 .. R2 Vs R1
+DEFAULT_PLAN = ('baseline', 'consecutive')
+
+
+def variance_name(new, old):
+    return f'{new} Vs {old}'
+
+
+def comparison_plan(runs, plan=DEFAULT_PLAN, baseline=None):
+    # Expand a plan name, a list of plan names, or an explicit list of (new, old) pairs
+    # into the ordered list of pairs to compute. Pairs repeated by several plans are kept once.
+    runs = list(runs)
+    if isinstance(plan, str):
+        plan = [plan]
+
+    pairs = []
+    for step in plan:
+        if isinstance(step, tuple):
+            pairs.append(step)
+        elif step == 'baseline':
+            base = baseline or runs[-1]
+            pairs += [(base, run) for run in runs if run != base]
+        elif step == 'consecutive':
+            pairs += [(runs[i], runs[i - 1]) for i in range(len(runs) - 1, 0, -1)]
+        elif step == 'all-pairs':
+            pairs += [(runs[i], runs[j]) for i in range(len(runs) - 1, 0, -1) for j in range(i)]
+        else:
+            raise ValueError(f"Unknown comparison plan {step!r}, expected one of {PLANS} or (new, old) pairs")
+
+    unknown = {run for pair in pairs for run in pair} - set(runs)
+    if unknown:
+        raise ValueError(f"Comparison plan refers to unknown runs: {sorted(unknown)}")
+    return list(dict.fromkeys(pairs))
+
+
+def percent_change(new, old):
+    # ((new - old) / new) * 100, NaN where either side is missing or new is 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = (new - old) / new * 100
+    change[~np.isfinite(change)] = np.nan
+    return change
+
+
+def variance_matrix(values, runs, pairs):
+    # Every percentage delta of the plan in one broadcast over the transactions x runs array
+    # (or any array whose last axis is the runs, such as a metrics x transactions x runs cube)
+    position = {run: i for i, run in enumerate(runs)}
+    new = values[..., [position[a] for a, _ in pairs]]
+    old = values[..., [position[b] for _, b in pairs]]
+    return percent_change(new, old)
+
+
+def run_values(df, runs):
+    # The run columns of df as a transactions x runs float array (non-numeric -> NaN).
+    # float32 runs stay float32; anything else becomes float64.
+    columns = [pd.to_numeric(df[run], errors='coerce') for run in runs]
+    dtype = np.float32 if all(column.dtype == np.float32 for column in columns) else np.float64
+    return np.column_stack([column.to_numpy(dtype=dtype) for column in columns])
+
+
+def add_variance_columns(df, runs, plan=DEFAULT_PLAN, baseline=None):
+    # Compute the plan's variance columns on df's run columns and append them to df.
+    # Returns the new DataFrame and the variance column names in plan order.
+    pairs = comparison_plan(runs, plan, baseline)
+    if not pairs:
+        return df, []
+    names = [variance_name(a, b) for a, b in pairs]
+    variances = pd.DataFrame(variance_matrix(run_values(df, runs), runs, pairs), columns=names, index=df.index)
+    return pd.concat([df, variances], axis=1), names
@@ -0,0 +1,249 @@
+import inspect
+import os
+import select
+import struct
+import sys
+import time
+import zipfile
+
+from .cache import MemoryReportCache, ReportCache
+from .ingest import is_report_name, report_files
+from .pipeline import pipeline_state, run_pipeline
+
+# Watch mode: keep the outputs up to date while reports land in the input folder.
+# The folder is watched with inotify where the platform has it (Linux), else polled.
+# Changes are debounced: a build starts once the folder has been quiet for `debounce`
+# seconds, so a burst of copied reports gives one build. A report is only taken once it
+# is complete: not modified for `debounce` seconds and, for xlsx, a readable zip (its
+# central directory is written last). A build only takes the reports sorting before the
+# first one still being written, so run numbers never shift while a copy is under way;
+# the rest are picked up by a later check. Parsed reports stay in memory between builds,
+# so each build parses only the new or changed files.
+# When the outputs are a report alone (and no option the append path lacks), reports
+# sorting after the existing runs are added to the saved matrix and the workbook is
+# written from it without parsing the older reports again (see excelcomp.incremental);
+# a report inserted in the middle, edited or removed rebuilds it. Any other outputs are
+# rebuilt by the full pipeline. Either way the workbook itself is written in full, which
+# is most of a build's time for large reports.
+#   'inotify' - kernel change events (Linux only)
+#   'poll'    - compare the folder's file sizes and mtimes every poll_interval seconds
+#   'auto'    - inotify if available, else poll
+WATCH_MODES = ('auto', 'inotify', 'poll')
+DEBOUNCE_SECONDS = 1.0
+POLL_SECONDS = 1.0
+
+# inotify_init1 flags and the events watched (from <sys/inotify.h>)
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+IN_EVENTS = {
+    'modify': 0x2, 'close_write': 0x8, 'moved_from': 0x40, 'moved_to': 0x80, 'create': 0x100, 'delete': 0x200,
+}
+IN_Q_OVERFLOW = 0x4000  # The kernel queue overflowed and events were lost (comes with no name)
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+# Name a watcher reports when it lost events, so the whole folder has to be checked
+RESCAN = None
+
+# Options the append path honours; any other option has to keep its pipeline default
+# (charts, sparklines, metrics, history, trend, shard limits, ...), except the ones that
+# only matter for artifacts other than the report
+APPEND_OPTIONS = ('workers', 'duplicates', 'backend', 'thresholds', 'threshold_mode', 'variance_mode', 'comparison')
+REPORT_UNUSED_OPTIONS = ('chart_layout', 'chart_workers', 'chart_cache_folder', 'filter_bands')
+
+
+class InotifyWatcher:
+    # inotify through libc; raises OSError where it is not available
+
+    def __init__(self, folder):
+        import ctypes
+        import ctypes.util
+
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = 0
+        for event in IN_EVENTS.values():
+            mask |= event
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Cannot watch {folder}")
+
+    def wait(self, timeout=None):
+        # Names of the files that changed, waiting up to timeout seconds (None: until one does);
+        # RESCAN among them when the event queue overflowed
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                if mask & IN_Q_OVERFLOW:
+                    names.add(RESCAN)
+                else:
+                    names.add(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+                offset += length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    # Compares (size, mtime) of the folder's files every interval seconds
+
+    def __init__(self, folder, interval=POLL_SECONDS):
+        self.folder = folder
+        self.interval = interval
+        self._stats = self._scan()
+
+    def _scan(self):
+        stats = {}
+        for entry in os.scandir(self.folder):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            stats[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(self.interval if deadline is None else max(0.0, min(self.interval, deadline - time.monotonic())))
+            stats = self._scan()
+            names = {name for name in stats.keys() | self._stats.keys() if stats.get(name) != self._stats.get(name)}
+            self._stats = stats
+            if names or (deadline is not None and time.monotonic() >= deadline):
+                return names
+
+    def close(self):
+        pass
+
+
+def open_watcher(folder, mode='auto', poll_interval=POLL_SECONDS):
+    if mode not in WATCH_MODES:
+        raise ValueError(f"Unknown watch mode {mode!r}, expected one of {WATCH_MODES}")
+    if mode != 'poll':
+        try:
+            return InotifyWatcher(folder)
+        except OSError:
+            if mode == 'inotify':
+                raise
+    return PollingWatcher(folder, poll_interval)
+
+
+def is_complete(file, settle=DEBOUNCE_SECONDS):
+    # True once file has not been modified for settle seconds and, for an xlsx, opens as a zip
+    try:
+        if time.time() - os.stat(file).st_mtime < settle:
+            return False
+        if file.lower().endswith('.xlsx'):
+            with zipfile.ZipFile(file):
+                pass
+    except (OSError, zipfile.BadZipFile):
+        return False
+    return True
+
+
+def ready_files(files, settle=DEBOUNCE_SECONDS):
+    # The leading complete files, up to the first one still being written
+    ready = []
+    for file in files:
+        if not is_complete(file, settle):
+            break
+        ready.append(file)
+    return ready
+
+
+def append_options(outputs, options):
+    # consolidate() arguments (see excelcomp.incremental) when the outputs can be kept up
+    # to date by appending runs, None when they need the full pipeline.
+    # Options left out get their pipeline defaults, which differ from consolidate()'s.
+    if set(outputs) != {'report'}:
+        return None
+    defaults = {name: parameter.default for name, parameter in inspect.signature(pipeline_state).parameters.items()}
+    for name, value in options.items():
+        if name not in APPEND_OPTIONS + REPORT_UNUSED_OPTIONS and value != defaults[name]:
+            return None
+    return {name: options.get(name, defaults[name]) for name in APPEND_OPTIONS}
+
+
+def watch_folder(folder, outputs, mode='auto', debounce=DEBOUNCE_SECONDS, poll_interval=POLL_SECONDS, builds=None,
+                 log=print, **options):
+    # Consolidate folder into outputs (as run_pipeline, with the same options) now and
+    # after every change, until interrupted or, with builds, after that many builds.
+    # Returns the number of builds. Outputs written into the watched folder are not reports.
+    produced = {os.path.abspath(path) for path in outputs.values()}
+    cache_folder = options.pop('cache_folder', None)
+    cache = MemoryReportCache(ReportCache(cache_folder) if cache_folder else None)
+    appending = append_options(outputs, options)
+    if appending is not None:
+        from .incremental import consolidate
+
+        # The append state is kept next to the report, as update_report.py keeps it
+        state_file = os.path.splitext(outputs['report'])[0] + '.state.npz'
+    watcher = open_watcher(folder, mode, poll_interval)
+    path = 'appending new runs' if appending is not None else 'full rebuilds'
+    log(f"Watching {folder} ({type(watcher).__name__}, {path}); press Ctrl+C to stop")
+
+    built = None  # (file, size, mtime) of the reports behind the current outputs
+    count = 0
+    due = time.monotonic()  # When the folder is next checked; None while nothing is pending
+    try:
+        while builds is None or count < builds:
+            timeout = None if due is None else max(0.0, due - time.monotonic())
+            events = watcher.wait(timeout)
+            if RESCAN in events:
+                # Events were lost: check every report again, even if nothing seems to have changed
+                built = None
+            changed = {name for name in events - {RESCAN}
+                       if is_report_name(name) and os.path.abspath(os.path.join(folder, name)) not in produced}
+            if changed or RESCAN in events:
+                # Every event pushes the check back, so a burst of files gives one build
+                due = time.monotonic() + debounce
+                continue
+            if due is None or time.monotonic() < due:
+                continue
+
+            files = [file for file in report_files(folder) if os.path.abspath(file) not in produced]
+            ready = ready_files(files, debounce)
+            # Reports still being written are looked at again after another debounce interval
+            due = time.monotonic() + debounce if len(ready) < len(files) else None
+            current = [(file, os.path.getsize(file), os.path.getmtime(file)) for file in ready]
+            if current == built or not ready:
+                continue
+            built = current
+
+            start = time.perf_counter()
+            misses = cache.misses
+            try:
+                if appending is not None:
+                    processed = consolidate(ready, outputs['report'], state_file, cache=cache, **appending)
+                else:
+                    run_pipeline(ready, outputs, report_cache=cache, **options)
+                    processed = len(ready)
+            except (ValueError, ImportError, OSError) as exc:
+                log(f"Consolidation failed: {exc}")
+                continue
+            cache.retain(ready)
+            count += 1
+            if processed < len(ready):
+                action = f"Appended {processed} of {len(ready)} report(s)"
+            else:
+                action = f"Consolidated {len(ready)} report(s)"
+            waiting = f", {len(files) - len(ready)} waiting for a report being written" if len(ready) < len(files) else ""
+            log(f"{action} ({cache.misses - misses} parsed{waiting}) in {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return count
@@ -0,0 +1,310 @@
+import io
+import os
+import re
+
+from .charts import (CHART_MODES, COMBINED_CHART_SIZE, IMAGE_CHART_ROWS, NATIVE_CHART_ROWS, add_openpyxl_line_chart,
+                     add_xlsxwriter_line_chart, chart_groups, chart_title, line_chart_spec, render_charts)
+from .shards import EXCEL_MAX_COLUMNS, EXCEL_MAX_ROWS, INDEX_HEADER, SHEET_NAME_LENGTH, plan_shards, shard_index
+from .sparklines import SPARKLINE_COLUMN, add_openpyxl_sparklines, add_xlsxwriter_sparklines
+from .styles import (THRESHOLDS, add_threshold_rules, add_xlsxwriter_threshold_rules, column_cells,
+                     metric_thresholds, register_openpyxl_styles, run_range, xlsxwriter_formats)
+from .variance import run_values
+
+# Streaming writer for the styled consolidated sheet.
+# Rows are produced in chunks and written once, in order, by a write-only backend,
+# so the workbook is never saved, reloaded and restyled the way the scripts did it.
+#   'openpyxl'   - openpyxl write-only workbook (always available)
+#   'xlsxwriter' - xlsxwriter in constant_memory mode (needs the xlsxwriter package)
+BACKENDS = ('openpyxl', 'xlsxwriter')
+
+# Rows classified and formatted per chunk, which bounds the temporary per-cell objects
+CHUNK_ROWS = 10000
+
+
+class OpenpyxlBackend:
+    # openpyxl write-only workbook; cells reference the shared named styles
+
+    def __init__(self, output_file):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+
+        self.output_file = output_file
+        self.wb = Workbook(write_only=True)
+        self._cell = WriteOnlyCell
+        self.styles = register_openpyxl_styles(self.wb)
+
+    def add_sheet(self, title):
+        return self.wb.create_sheet(title=title)
+
+    def write_row(self, ws, row):
+        cells = []
+        for value, style in row:
+            cell = self._cell(ws, value=value)
+            if isinstance(value, str):
+                cell.data_type = 's'  # Text as written, never a formula
+            cell.style = self.styles[style]
+            cells.append(cell)
+        ws.append(cells)
+
+    def add_threshold_rules(self, ws, runs, first_row, last_row, thresholds):
+        add_threshold_rules(ws, run_range(runs, first_row + 1, last_row + 1), thresholds)
+
+    def add_line_chart(self, ws, data_ws, columns, last_row, title, anchor, size=None):
+        add_openpyxl_line_chart(ws, data_ws, [column + 1 for column in columns], last_row + 1, title, anchor, size)
+
+    def add_sparklines(self, ws, values, first_col, column, first_row):
+        add_openpyxl_sparklines(ws, values, column + 1, first_row + 1)
+
+    def add_image(self, ws, png, anchor):
+        from openpyxl.drawing.image import Image
+
+        img = Image(io.BytesIO(png))
+        img.anchor = anchor
+        ws.add_image(img)
+
+    def close(self):
+        self.wb.save(self.output_file)
+
+
+class XlsxWriterBackend:
+    # xlsxwriter constant_memory workbook; rows are flushed to disk as they are written
+
+    def __init__(self, output_file):
+        try:
+            import xlsxwriter
+        except ImportError as exc:
+            raise ImportError("The 'xlsxwriter' backend needs the xlsxwriter package (pip install xlsxwriter)") from exc
+
+        # Strings stay text, as openpyxl writes them: no URLs, formulas or numbers made of them
+        self.wb = xlsxwriter.Workbook(output_file, {'constant_memory': True, 'strings_to_urls': False,
+                                                    'strings_to_formulas': False, 'strings_to_numbers': False})
+        self.formats = xlsxwriter_formats(self.wb)
+        self._rows = {}
+
+    def add_sheet(self, title):
+        ws = self.wb.add_worksheet(title)
+        self._rows[ws.name] = 0
+        return ws
+
+    def write_row(self, ws, row):
+        r = self._rows[ws.name]
+        for c, (value, style) in enumerate(row):
+            if value is None:
+                ws.write_blank(r, c, None, self.formats[style])
+            else:
+                ws.write(r, c, value, self.formats[style])
+        self._rows[ws.name] = r + 1
+
+    def add_threshold_rules(self, ws, runs, first_row, last_row, thresholds):
+        add_xlsxwriter_threshold_rules(self.wb, ws, first_row, 1, last_row, len(runs), thresholds)
+
+    def add_line_chart(self, ws, data_ws, columns, last_row, title, anchor, size=None):
+        add_xlsxwriter_line_chart(self.wb, ws, data_ws.name, columns, last_row, title, anchor, size)
+
+    def add_sparklines(self, ws, values, first_col, column, first_row):
+        add_xlsxwriter_sparklines(ws, len(values), first_col, first_col + values.shape[1] - 1, column, first_row)
+
+    def add_image(self, ws, png, anchor):
+        ws.insert_image(anchor, 'chart.png', {'image_data': io.BytesIO(png)})
+
+    def close(self):
+        self.wb.close()
+
+
+def open_backend(output_file, backend='openpyxl'):
+    if backend == 'openpyxl':
+        return OpenpyxlBackend(output_file)
+    if backend == 'xlsxwriter':
+        return XlsxWriterBackend(output_file)
+    raise ValueError(f"Unknown writer backend {backend!r}, expected one of {BACKENDS}")
+
+
+def sheet_header(runs, variance_columns, sparklines=False):
+    # Column names of the consolidated sheet, in order
+    return ['Transactions'] + list(runs) + list(variance_columns) + ([SPARKLINE_COLUMN] if sparklines else [])
+
+
+def styled_rows(merged_df, runs, variance_columns, chunk_rows=CHUNK_ROWS, thresholds=THRESHOLDS, threshold_mode='cells',
+                variance_mode='text', sparklines=False, header_style='header'):
+    # Yield the sheet row by row as lists of (value, style key), header first
+    # (header_style='text' gives it borders without the fill).
+    # With sparklines, a last blank bordered column is left for the trend lines.
+    yield [(name, header_style) for name in sheet_header(runs, variance_columns, sparklines)]
+
+    for start in range(0, len(merged_df), chunk_rows):
+        chunk = merged_df.iloc[start:start + chunk_rows]
+        columns = column_cells(chunk, runs, variance_columns, thresholds, threshold_mode, variance_mode)
+        if sparklines:
+            columns.append(([None] * len(chunk), ['text'] * len(chunk)))
+        for i in range(len(columns[0][0])):
+            yield [(values[i], styles[i]) for values, styles in columns]
+
+
+def add_charts(writer, data_ws, merged_df, header, chart_columns, sheet_name='Graphs', chart_mode='native',
+               chart_layout='combined', chart_workers=1, chart_cache_folder=None, images=None, last_row=None):
+    # Add a sheet of line charts over chart_columns of the data sheet written from merged_df,
+    # whose header row lists the sheet's columns in order; sheet_name=None puts them on the
+    # data sheet instead, below the table. In image mode, already rendered PNGs (one per
+    # chart column) can be passed as images. Native charts plot the data sheet's rows down
+    # to last_row (all of merged_df by default).
+    last_row = len(merged_df) if last_row is None else last_row
+    if sheet_name is None:
+        ws, top = data_ws, last_row + 3  # One blank row under the table
+    else:
+        ws, top = writer.add_sheet(sheet_name), 1
+    if chart_mode == 'native':
+        size = COMBINED_CHART_SIZE if chart_layout == 'combined' else None
+        for i, group in enumerate(chart_groups(chart_columns, chart_layout)):
+            writer.add_line_chart(ws, data_ws, [header.index(column) for column in group], last_row,
+                                  chart_title(group), f"A{top + i * NATIVE_CHART_ROWS}", size)
+    elif chart_mode == 'image':
+        if images is None:
+            specs = [line_chart_spec(chart_title([column]), merged_df[column]) for column in chart_columns]
+            images = render_charts(specs, workers=chart_workers, cache_folder=chart_cache_folder)
+        for i, png in enumerate(images):
+            writer.add_image(ws, png, f"A{top + i * IMAGE_CHART_ROWS}")
+    else:
+        raise ValueError(f"Unknown chart mode {chart_mode!r}, expected one of {CHART_MODES}")
+    return ws
+
+
+def metric_sheet_name(metric, taken=()):
+    # Sheet name of a metric column: characters Excel rejects dropped, cut to the name
+    # length limit and made unique against the names already taken
+    name = re.sub(r'[\[\]:*?/\\]', '', str(metric)).strip().strip("'")[:SHEET_NAME_LENGTH] or 'Metric'
+    unique, n = name, 1
+    while unique.lower() in {sheet.lower() for sheet in taken}:
+        n += 1
+        unique = f"{name[:SHEET_NAME_LENGTH - len(str(n)) - 1]} {n}"
+    return unique
+
+
+def metric_tables(cube, variance_columns, variances, thresholds=THRESHOLDS):
+    # One table per metric of a MetricCube: its sheet name, its Transactions / runs /
+    # variance frame (variances being the cube's metrics x transactions x pairs array)
+    # and the thresholds colouring it (none for metrics that are not latencies)
+    tables = []
+    for k, metric in enumerate(cube.metrics):
+        tables.append({
+            'sheet': metric_sheet_name(metric, [table['sheet'] for table in tables]),
+            'merged_df': cube.matrix(metric).to_frame(variance_columns, variances[k]),
+            'thresholds': metric_thresholds(metric, thresholds),
+        })
+    return tables
+
+
+def write_shards(writer, backend, shards, header_row, rows, merged_df, runs, thresholds, threshold_mode, sparklines):
+    # Write one table's shard sheets, streaming its rows, and return its first sheet.
+    # writer is the first workbook, which stays open; shards in any later workbook get a
+    # writer of their own, closed as soon as its row shards are written.
+    first_writer = writer
+    workbook = shards[0]['workbook']
+    data_ws = None
+    for row_shard in range(shards[-1]['row_shard'] + 1):
+        sheet_shards = [shard for shard in shards if shard['row_shard'] == row_shard]
+        if sheet_shards[0]['workbook'] != workbook:
+            if writer is not first_writer:
+                writer.close()
+            workbook = sheet_shards[0]['workbook']
+            writer = open_backend(workbook, backend)
+        start, stop = sheet_shards[0]['rows']
+
+        sheets = []
+        for shard in sheet_shards:
+            ws = writer.add_sheet(shard['sheet'])
+            writer.write_row(ws, [header_row[i] for i in shard['columns']])
+            sheets.append(ws)
+        data_ws = data_ws or sheets[0]
+        # Runs, Trend and the threshold rules all live on the first column shard
+        if sparklines and runs and stop > start:
+            writer.add_sparklines(sheets[0], run_values(merged_df.iloc[start:stop], runs), 1,
+                                  len(sheet_shards[0]['columns']) - 1, 1)
+        if threshold_mode == 'rules' and thresholds is not None and runs and stop > start:
+            # Rows 1..stop - start (0-based) hold the data below the header
+            writer.add_threshold_rules(sheets[0], runs, 1, stop - start, thresholds)
+
+        if len(sheets) == 1:
+            for _ in range(start, stop):
+                writer.write_row(sheets[0], next(rows))
+        else:
+            for _ in range(start, stop):
+                row = next(rows)
+                for ws, shard in zip(sheets, sheet_shards):
+                    writer.write_row(ws, [row[i] for i in shard['columns']])
+    if writer is not first_writer:
+        writer.close()
+    return data_ws
+
+
+def write_consolidated(output_file, merged_df, runs, variance_columns, backend='openpyxl', sheet_name='Sheet1',
+                       thresholds=THRESHOLDS, threshold_mode='cells', variance_mode='text', chart_columns=(),
+                       chart_mode='native', chart_layout='combined', chart_sheet='Graphs', chart_workers=1,
+                       chart_cache_folder=None, sparklines=False, rows=None, images=None, summary=None,
+                       summary_sheet='Metrics', max_rows=EXCEL_MAX_ROWS, max_columns=EXCEL_MAX_COLUMNS,
+                       shards_per_workbook=None, index_sheet='Index', tables=None, header_style='header'):
+    # Write the styled consolidated sheet in a single streaming pass.
+    # threshold_mode='rules' colours the run columns with conditional formatting instead,
+    # variance_mode='number' keeps the variance cells numeric (see excelcomp.styles).
+    # With chart_columns, a chart_sheet of line charts over those columns follows
+    # (see excelcomp.charts), or with chart_sheet=None they go below the table on the data
+    # sheet. Native charts plot the cells themselves, so variance columns need
+    # variance_mode='number'; arrow text would plot as nothing.
+    # sparklines=True adds a Trend column with each transaction's R1..Rn line
+    # (see excelcomp.sparklines).
+    # rows and images let a caller pass styled_rows and rendered charts it already built.
+    # header_style='text' writes the header row bordered but without its fill.
+    # summary, a header row plus data rows, is written as one more plain table sheet.
+    # A table larger than max_rows x max_columns (Excel's limits by default) is split over
+    # shard sheets, and with shards_per_workbook over several workbooks, behind an
+    # index_sheet (see excelcomp.shards); native charts then plot the first shard.
+    # tables (see metric_tables), each a dict of sheet, merged_df, thresholds and
+    # optionally rows, are written one sheet each in place of merged_df; charts then plot
+    # the first table, which merged_df should be.
+    # Returns the workbook files written.
+    if chart_columns and chart_mode == 'native' and variance_mode == 'text' and set(chart_columns) & set(variance_columns):
+        raise ValueError("Native charts of variance columns need variance_mode='number'")
+    if tables is None:
+        tables = [{'sheet': sheet_name, 'merged_df': merged_df, 'thresholds': thresholds, 'rows': rows}]
+    elif len(tables) > 1 and shards_per_workbook:
+        raise ValueError("shards_per_workbook needs a single table; several metric tables share one workbook")
+    header = sheet_header(runs, variance_columns, sparklines)
+    plans = [plan_shards(output_file, table['sheet'], len(table['merged_df']), header, runs, sparklines, max_rows,
+                         max_columns, shards_per_workbook) for table in tables]
+    first_header = [header[i] for i in plans[0][0]['columns']]
+    if chart_columns and chart_mode == 'native' and not set(chart_columns) <= set(first_header):
+        raise ValueError("Native charts need their columns on the first shard sheet")
+
+    # Every workbook goes next to output_file; create its folder as the other outputs do
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+    # The first workbook stays open for the charts and the summary
+    writer = open_backend(output_file, backend)
+    if any(len(shards) > 1 for shards in plans):
+        index_ws = writer.add_sheet(index_sheet)
+        index = [INDEX_HEADER]
+        for table, shards in zip(tables, plans):
+            index += shard_index(shards, header, table['merged_df']['Transactions'])[1:]
+        for i, row in enumerate(index):
+            writer.write_row(index_ws, [(value, 'header' if i == 0 else 'text') for value in row])
+
+    data_ws = None
+    for table, shards in zip(tables, plans):
+        rows = table.get('rows')
+        if rows is None:
+            rows = styled_rows(table['merged_df'], runs, variance_columns, thresholds=table['thresholds'],
+                               threshold_mode=threshold_mode, variance_mode=variance_mode, sparklines=sparklines,
+                               header_style=header_style)
+        rows = iter(rows)
+        header_row = next(rows)
+        ws = write_shards(writer, backend, shards, header_row, rows, table['merged_df'], runs, table['thresholds'],
+                          threshold_mode, sparklines)
+        data_ws = data_ws or ws
+
+    if chart_columns:
+        add_charts(writer, data_ws, tables[0]['merged_df'], first_header, chart_columns, chart_sheet, chart_mode,
+                   chart_layout, chart_workers, chart_cache_folder, images, last_row=plans[0][0]['rows'][1])
+    if summary:
+        summary_ws = writer.add_sheet(summary_sheet)
+        for i, row in enumerate(summary):
+            writer.write_row(summary_ws, [(value, 'header' if i == 0 else 'text') for value in row])
+    writer.close()
+    return list(dict.fromkeys(shard['workbook'] for shards in plans for shard in shards))
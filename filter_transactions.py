@@ -1,54 +1,20 @@
-import pandas as pd
 import os
+from excelcomp.filters import band_labels, write_filter_csv
+from excelcomp.ingest import read_report
 
 # Input folder and output folder
 input_folder = "./input_reports"  # Folder where your Excel files are located
 output_file = "./output_reports/Consolidated_Filtered_Reports.csv"  # Single output CSV file
+bands = (1.8, 2.0)  # Band edges in seconds: one table per band, [1.8, 2) and >= 2 by default
 
-# Ensure output folder exists
-os.makedirs(os.path.dirname(output_file), exist_ok=True)
+# Process the Excel files in the input folder in name order, so report numbers are stable
+file_names = sorted(file_name for file_name in os.listdir(input_folder) if file_name.endswith(".xlsx"))
 
-# Initialize a list to store all rows for the consolidated CSV
-all_data = []
+# Read the reports one at a time while they are written out
+report_dfs = (read_report(os.path.join(input_folder, file_name)) for file_name in file_names)
 
-# Process each Excel file in the input folder
-report_number = 1
-for file_name in os.listdir(input_folder):
-    if file_name.endswith(".xlsx"):
-        # Read the Excel file
-        file_path = os.path.join(input_folder, file_name)
-        df = pd.read_excel(file_path)
+# Save a heading and one table per band (1.8 to <2 seconds, >=2 seconds) for every
+# report to a single CSV file, creating the output folder if needed
+rows = write_filter_csv(output_file, file_names, report_dfs, bands)
 
-        # Ensure the "time(90%)" column is numeric
-        df["time(90%)"] = pd.to_numeric(df["time(90%)"], errors="coerce")
-
-        # Drop rows with invalid "time(90%)" values
-        df = df.dropna(subset=["time(90%)"])
-
-        # Filter transactions: 1.8 to <2 seconds
-        filtered_1_8_to_2 = df[(df["time(90%)"] >= 1.8) & (df["time(90%)"] < 2)].copy()
-
-        # Filter transactions: >=2 seconds
-        filtered_2_or_more = df[df["time(90%)"] >= 2].copy()
-
-        # Add a heading for the current report
-        all_data.append([f"Report {report_number}: Filtered Data for {file_name}"])
-        
-        # Add the first filtered table for 1.8 to <2 seconds
-        all_data.append(["Table: Transactions with 1.8 to <2 seconds"])
-        all_data.extend(filtered_1_8_to_2.values.tolist())
-        all_data.append([])  # Add a blank row for separation
-        
-        # Add the second filtered table for >=2 seconds
-        all_data.append(["Table: Transactions with >=2 seconds"])
-        all_data.extend(filtered_2_or_more.values.tolist())
-        all_data.append([])  # Add another blank row for separation
-
-        report_number += 1
-
-# Save the consolidated data to a CSV file
-with open(output_file, "w", encoding="utf-8") as f:
-    for row in all_data:
-        f.write(",".join(map(str, row)) + "\n")
-
-print(f"Processing complete. Consolidated report saved as {output_file}.")
+print(f"Processing complete. {rows} transactions in {', '.join(band_labels(bands))} saved as {output_file}.")
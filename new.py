@@ -1,71 +1,41 @@
-import pandas as pd
 import glob
-from openpyxl import load_workbook
-from openpyxl.styles import Font
+from excelcomp.cache import ReportCache
+from excelcomp.ingest import read_reports
+from excelcomp.join import join_reports
+from excelcomp.writer import write_consolidated
 
 # Set the folder containing the reports and output file name
 input_folder = "./input_reports/"  # Replace with your folder path
 output_file = 'consolidated_report.xlsx'
-
-# Get the list of Excel files in the folder
-excel_files = sorted(glob.glob(input_folder + "*.xlsx"))  # Ensure files are sorted by name
-
-# Initialize a DataFrame for Report 1 to use as the base order
-base_df = pd.DataFrame()
-
-# Initialize an empty DataFrame to store the merged data
-merged_df = pd.DataFrame()
-
-# Loop through each file and merge data
-for i, file in enumerate(excel_files, start=1):
-    # Read the file into a DataFrame and rename columns explicitly
-    df = pd.read_excel(file, header=0)  # Assuming the first row has headers
-    df.columns = ['Transactions', f'Report {i} time(90%)']  # Force consistent column names
-    
-    if i == 1:
-        # Use the first report as the base for order
-        base_df = df
-    
-    # Merge with the main DataFrame
-    if merged_df.empty:
-        merged_df = df
-    else:
-        merged_df = pd.merge(merged_df, df, on='Transactions', how='outer')
-
-# Sort by the base DataFrame's order
-merged_df = base_df[['Transactions']].merge(merged_df, on='Transactions', how='left')
-
-# Replace NaN with empty strings if needed
-merged_df.fillna("", inplace=True)
-
-# Reorder columns so the reports are in order (Report 1, Report 2, ..., Report 5)
-columns_order = ['Transactions'] + [f'Report {i} time(90%)' for i in range(1, len(excel_files) + 1)]
-merged_df = merged_df[columns_order]
-
-# Write the merged DataFrame to an Excel file
-merged_df.to_excel(output_file, index=False)
-
-# Apply Font Color Formatting
-wb = load_workbook(output_file)
-ws = wb.active
-
-# Define font colors
-green_font = Font(color="00FF00")   # Green
-orange_font = Font(color="FFA500") # Orange
-red_font = Font(color="FF0000")    # Red
-
-# Loop through the cells to apply formatting
-for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=2, max_col=ws.max_column):
-    for cell in row:
-        if isinstance(cell.value, (int, float)):  # Ensure it's a number
-            if cell.value >= 2:
-                cell.font = red_font
-            elif 1.8 <= cell.value < 2:
-                cell.font = orange_font
-            else:
-                cell.font = green_font
-
-# Save the workbook
-wb.save(output_file)
-
-print(f"Consolidated report with font color formatting saved to {output_file}")
+workers = 1  # Processes used to parse the reports (>1 parses them in parallel)
+cache_folder = '.report_cache'  # Parsed reports are cached here (None disables the cache)
+thresholds = (1.8, 2.0)  # Latency thresholds in seconds: orange from the first, red from the second
+threshold_mode = 'cells'  # 'cells' colours each cell, 'rules' adds range-level conditional formatting
+writer_backend = 'openpyxl'  # 'openpyxl' (write-only mode) or 'xlsxwriter' (constant_memory mode)
+
+# Worker processes (workers > 1) re-import this script, so the work only runs when it is executed
+if __name__ == "__main__":
+    # Get the list of Excel files in the folder
+    excel_files = sorted(glob.glob(input_folder + "*.xlsx"))  # Ensure files are sorted by name
+
+    # Parse all reports up front; the results keep the sorted file order
+    cache = ReportCache(cache_folder) if cache_folder else None
+    report_dfs = read_reports(excel_files, workers=workers, cache=cache)
+
+    # Join all reports on Transactions in one pass, keeping Report 1's order.
+    # Transactions missing from Report 1 are appended at the end, and a transaction
+    # listed twice in one report keeps its first value.
+    merged_df = join_reports(report_dfs, [f'Report {i} time(90%)' for i in range(1, len(excel_files) + 1)])
+
+    # Missing values stay NaN so the columns remain numeric; they are written as blank cells
+
+    # Reorder columns so the reports are in order (Report 1, Report 2, ..., Report 5)
+    columns_order = ['Transactions'] + [f'Report {i} time(90%)' for i in range(1, len(excel_files) + 1)]
+    merged_df = merged_df[columns_order]
+
+    # Write the sheet in one streaming pass with the threshold font colours on every report column
+    runs = columns_order[1:]
+    write_consolidated(output_file, merged_df, runs, [], backend=writer_backend, header_style='text',
+                       thresholds=thresholds, threshold_mode=threshold_mode)
+
+    print(f"Consolidated report with font color formatting saved to {output_file}")
@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from excelcomp.export import read_matrix, write_matrix
+
+
+@pytest.mark.parametrize('extension', ['.parquet', '.arrow'])
+def test_missing_transaction_name_stays_null(tmp_path, extension):
+    pytest.importorskip('pyarrow')
+    merged_df = pd.DataFrame({'Transactions': ['Login', np.nan], 'R1': [1.0, 2.0], 'R2': [1.5, np.nan]})
+    output_file = str(tmp_path / f'matrix{extension}')
+    write_matrix(output_file, merged_df, ['R1', 'R2'], [], ['Report1.xlsx', 'Report2.xlsx'], ['a', 'b'])
+
+    table, _ = read_matrix(output_file)
+    assert table.column('Transactions').to_pylist() == ['Login', None]
@@ -0,0 +1,19 @@
+import pandas as pd
+import pytest
+
+from excelcomp.filters import filter_report
+
+
+def test_filter_uses_second_column():
+    # Reports whose latency column is not called time(90%) are banded on their second column
+    df = pd.DataFrame({'Transactions': ['Login', 'Search', 'Checkout', 'Logout'],
+                       'p95': [1.9, 2.4, 0.5, 'n/a'], 'throughput': [10, 20, 30, 40]})
+    low, high = filter_report(df)
+    assert low['Transactions'].tolist() == ['Login']
+    assert high['Transactions'].tolist() == ['Search']
+
+    # A named column is used instead, and a missing one is reported by name
+    assert [band['Transactions'].tolist() for band in filter_report(df, (15, 25), 'throughput')] == \
+        [['Search'], ['Checkout', 'Logout']]
+    with pytest.raises(ValueError, match='time'):
+        filter_report(df, column='time(90%)')
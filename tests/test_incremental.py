@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from excelcomp.incremental import consolidate
+
+
+def write_reports(folder, count):
+    files = []
+    for run in range(1, count + 1):
+        df = pd.DataFrame({'Transactions': ['Login', 'Search', 'Checkout'],
+                           'time(90%)': [1.0 + 0.2 * run, 1.5 + 0.2 * run, 2.0 + 0.2 * run]})
+        file = os.path.join(folder, f'Report{run}.xlsx')
+        df.to_excel(file, index=False)
+        files.append(file)
+    return files
+
+
+def sheet(output_file):
+    ws = load_workbook(output_file).active
+    cells = [[(cell.value, cell.style) for cell in row] for row in ws.iter_rows()]
+    return cells, [(str(rule.sqref), [r.formula for r in rule.rules]) for rule in ws.conditional_formatting]
+
+
+@pytest.mark.parametrize('threshold_mode', ['cells', 'rules'])
+def test_append_matches_cold_build(tmp_path, threshold_mode):
+    # An appended run is styled with the thresholds the sheet was built with
+    files = write_reports(tmp_path, 3)
+    options = {'cache': None, 'thresholds': (1.5, 2.5), 'threshold_mode': threshold_mode}
+    appended, cold = str(tmp_path / 'appended.xlsx'), str(tmp_path / 'cold.xlsx')
+    assert consolidate(files[:2], appended, **options) == 2
+    assert consolidate(files, appended, **options) == 1
+    assert consolidate(files, cold, **options) == 3
+    assert sheet(appended) == sheet(cold)
+
+    # Other settings than the saved ones rebuild the sheet
+    assert consolidate(files, appended, cache=None) == 3
+
+
+@pytest.mark.parametrize('comparison', ['consecutive', ('baseline', 'consecutive'), [('R2', 'R1')]])
+def test_append_adds_new_transactions(tmp_path, comparison):
+    # Transactions first seen in a new report get rows at the end, as in a cold build,
+    # under any comparison plan
+    files = write_reports(tmp_path, 2)
+    pd.DataFrame({'Transactions': ['Logout', 'Search', 'Search', 'Login'],
+                  'time(90%)': [0.5, 2.1, 9.9, 1.7]}).to_excel(tmp_path / 'Report3.xlsx', index=False)
+    files.append(str(tmp_path / 'Report3.xlsx'))
+    appended, cold = str(tmp_path / 'appended.xlsx'), str(tmp_path / 'cold.xlsx')
+    assert consolidate(files[:2], appended, cache=None, comparison=comparison) == 2
+    assert consolidate(files, appended, cache=None, comparison=comparison) == 1
+    assert consolidate(files, cold, cache=None, comparison=comparison) == 3
+    assert sheet(appended) == sheet(cold)
+    assert [row[0][0] for row in sheet(appended)[0]] == ['Transactions', 'Login', 'Search', 'Checkout', 'Logout']
@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+import pytest
+
+from excelcomp.pipeline import run_pipeline
+from excelcomp.trend import TrendMatrix
+
+
+def write_reports(folder, count, rows=5):
+    # count small reports Report1.xlsx .. ReportN.xlsx of Transactions / time(90%)
+    files = []
+    for run in range(1, count + 1):
+        df = pd.DataFrame({'Transactions': [f'T{i}' for i in range(rows)],
+                           'time(90%)': [1.0 + 0.1 * i + 0.01 * run for i in range(rows)]})
+        file = os.path.join(folder, f'Report{run}.xlsx')
+        df.to_excel(file, index=False)
+        files.append(file)
+    return files
+
+
+def test_history_selection_with_trend(tmp_path):
+    # The trend matrix gets the ingested reports, not the stored runs the history selects
+    files = write_reports(tmp_path, 4)
+    history = str(tmp_path / 'history.sqlite')
+    trend = str(tmp_path / 'trend')
+    run_pipeline(files[:3], {'report': str(tmp_path / 'first.xlsx')}, cache_folder=None, history_file=history)
+
+    state = run_pipeline(files[3:], {'report': str(tmp_path / 'report.xlsx')}, cache_folder=None,
+                         history_file=history, history_last=2, trend_file=trend)
+    assert state['runs'] == ['R1', 'R2']
+    assert [os.path.basename(file) for file in state['excel_files']] == ['Report3.xlsx', 'Report4.xlsx']
+    assert [run['file'] for run in TrendMatrix(trend).runs] == ['Report4.xlsx']
+
+
+@pytest.mark.parametrize('outputs', [('filter',), ('filter', 'report')])
+def test_filter_with_metric_columns(tmp_path, outputs):
+    # With several metric columns the bands are taken on the primary (first) metric,
+    # not on the report's second column
+    files = []
+    for run in range(1, 3):
+        df = pd.DataFrame({'Transactions': ['Login', 'Search', 'Checkout'], 'Status': ['ok', 'ok', 'slow'],
+                           'p50': [1.9, 2.2 + run, 0.4], 'p95': [2.5, 3.0, 0.9], 'throughput': [10, 20, 30]})
+        files.append(str(tmp_path / f'Report{run}.xlsx'))
+        df.to_excel(files[-1], index=False)
+    paths = {'filter': str(tmp_path / 'filtered.csv'), 'report': str(tmp_path / 'report.xlsx')}
+    run_pipeline(files, {output: paths[output] for output in outputs}, cache_folder=None, metric_columns='all')
+
+    with open(paths['filter'], encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert lines[:6] == ['Report 1: Filtered Data for Report1.xlsx', 'Table: Transactions with 1.8 to <2 seconds',
+                         'Login,ok,1.9,2.5,10', '', 'Table: Transactions with >=2 seconds', 'Search,ok,3.2,3.0,20']
+
+
+def test_history_selection_parses_only_new_reports(tmp_path):
+    # Reports the history already holds are not parsed again when consolidating from it
+    files = write_reports(tmp_path, 4)
+    history = str(tmp_path / 'history.sqlite')
+    run_pipeline(files[:3], {'report': str(tmp_path / 'first.xlsx')}, cache_folder=None, history_file=history)
+
+    def parsed(state):
+        return [record['detail'] for record in state['metrics'].records if record['stage'] == 'read_excel']
+
+    state = run_pipeline(files, {'report': str(tmp_path / 'report.xlsx')}, cache_folder=None,
+                         history_file=history, history_last=2)
+    assert [os.path.basename(file) for file in parsed(state)] == ['Report4.xlsx']
+    assert state['excel_files'] == ['Report3.xlsx', 'Report4.xlsx']
+
+    state = run_pipeline(files, {'report': str(tmp_path / 'report.xlsx')}, cache_folder=None,
+                         history_file=history, history_last=2)
+    assert parsed(state) == []
+    assert state['merged_df']['R2'].tolist() == [1.04, 1.14, 1.24, 1.34, 1.44]
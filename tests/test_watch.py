@@ -0,0 +1,13 @@
+from excelcomp.variance import DEFAULT_PLAN
+from excelcomp.watch import append_options
+
+
+def test_append_options_take_any_comparison():
+    # A report alone is appended under any plan; options left out get the pipeline defaults
+    appending = append_options({'report': 'report.xlsx'}, {'comparison': ['all-pairs'], 'backend': 'xlsxwriter'})
+    assert appending['comparison'] == ['all-pairs'] and appending['backend'] == 'xlsxwriter'
+    assert append_options({'report': 'report.xlsx'}, {})['comparison'] == DEFAULT_PLAN
+
+    # Outputs or options the append path lacks need the full pipeline
+    assert append_options({'report': 'report.xlsx', 'filter': 'filter.csv'}, {}) is None
+    assert append_options({'report': 'report.xlsx'}, {'sparklines': True}) is None
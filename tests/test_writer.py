@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from excelcomp.writer import write_consolidated
+
+# Transaction names xlsxwriter would otherwise turn into a hyperlink, drop (URLs past
+# Excel's 2079 character limit) or write as a formula
+NAMES = ['https://example.com/login', 'http://example.com/' + 'a' * 3000, '=SUM(1,2)', 'Plain']
+
+
+@pytest.mark.parametrize('backend', ['openpyxl', 'xlsxwriter'])
+def test_backends_keep_names_as_text(tmp_path, backend):
+    pytest.importorskip(backend)
+    merged_df = pd.DataFrame({'Transactions': NAMES, 'R1': [1.0, 1.9, 2.5, None]})
+    output_file = str(tmp_path / f'{backend}.xlsx')
+    write_consolidated(output_file, merged_df, ['R1'], [], backend=backend)
+
+    ws = load_workbook(output_file).active
+    cells = [row[0] for row in ws.iter_rows(min_row=2, max_col=1)]
+    assert [cell.value for cell in cells] == NAMES
+    assert all(cell.data_type == 's' and cell.hyperlink is None for cell in cells)
@@ -0,0 +1,30 @@
+import glob
+from excelcomp.cache import ReportCache
+from excelcomp.incremental import consolidate
+
+# Set the folder containing the reports and output file name
+input_folder = "./input_reports/"  # Replace with your folder path
+output_file = 'consolidated_report.xlsx'
+state_file = 'consolidated_report.state.npz'  # Consolidated matrix kept between runs
+workers = 1  # Processes used to parse the reports (>1 parses them in parallel)
+cache_folder = '.report_cache'  # Parsed reports are cached here (None disables the cache)
+thresholds = (1.8, 2.0)  # Latency thresholds in seconds: orange from the first, red from the second
+threshold_mode = 'cells'  # 'cells' colours each cell, 'rules' adds range-level conditional formatting
+variance_mode = 'text'  # 'text' writes "12.34 % ↑" strings, 'number' keeps floats under an arrow number format
+comparison = 'consecutive'  # Variance plan: 'baseline', 'consecutive', 'all-pairs' and/or (new, old) pairs
+writer_backend = 'openpyxl'  # 'openpyxl' (write-only mode) or 'xlsxwriter' (constant_memory mode)
+
+# Worker processes (workers > 1) re-import this script, so the work only runs when it is executed
+if __name__ == "__main__":
+    # Get the list of Excel files in the folder
+    excel_files = sorted(glob.glob(input_folder + "*.xlsx"))  # Ensure files are sorted by name
+
+    # Parse only the reports that arrived since the last run and write the sheet from the saved
+    # matrix; a cold or changed input folder, or settings other than the ones the sheet was
+    # built with, fall back to a full rebuild
+    cache = ReportCache(cache_folder) if cache_folder else None
+    processed = consolidate(excel_files, output_file, state_file, workers=workers, cache=cache, backend=writer_backend,
+                            variance_mode=variance_mode, thresholds=thresholds, threshold_mode=threshold_mode,
+                            comparison=comparison)
+
+    print(f"Consolidated report updated with {processed} report(s) and saved to {output_file}")